@@ -1,60 +1,58 @@
-import requests
 import random
 import html
 from time import sleep
 import time
-import threading
 import curses
 from curses_ui import curses_main, QuizUI
+from profiler import run_profiled, PROFILE_DIR
+from broker import broker_request, BrokerUnavailable
+from checkpoint import SessionJournal
+from history import GameHistory
+from question_index import question_id
+from opentdb import (
+    QUESTION_INDEX,
+    UPSTREAM,
+    apply_settings,
+    reload_settings,
+    get_session_token_upstream,
+    reset_session_token,
+    get_categories_upstream,
+    fetch_questions_upstream,
+    TokenRejected
+)
+from near_duplicates import NearDuplicateIndex, question_text, question_answer
+from timer_wheel import get_timer_wheel
+import daily_challenge
+from question_sources import FileSource, Prefetcher, QuestionStream, pipeline, validate_stage, filter_stage, dedup_stage, shuffle_stage
 from functools import partial
 import json
 import os
+import argparse
+from settings import SETTINGS, SettingsError
 from config import (  
-    TIME_ANSWER_MAX,
-    RETRY_CHANCE,
-    RETRY_DELAY,
     RANKINGBOARD_FILE,
+    RENDER_PROFILE,
     load_best_score,
     update_best_score,
     update_rankingboard,
     load_rankingboard,
-    API_BASIC,
-    TOKEN_URL,
-    CATEGORY_URL,
-    get_session_token,
-    fetch_questions,
-    get_categories
+    SETTINGS_FILE,
+    OFFLINE_TOKEN
 )
 
-def get_session_token():   # Get the session token
-    try:
-        response = requests.get(f"{TOKEN_URL}?command=request")   # Request the token from the API
-        response.raise_for_status()                               # Raise an exception for bad status codes
-        data = response.json()                                    # Get the data from the API
-        if data['response_code'] == 0:                            # Check if the response code is 0
-            return data['token']                                  # Return the token
-        else:
-            print("Failed to request token! Response Code:", data['response_code'])
-            return None
-    except requests.exceptions.RequestException as e:   # Handle the exception if the request fails
-        print("Error in requesting token:", str(e))     # Print the error message
-        return None   # Return None
+NEAR_DUPLICATES = NearDuplicateIndex()   # Clusters of near-identical questions seen by this process
 
-def reset_session_token(token):   # Reset the session token
+def get_session_token():   # Get the session token, from the local broker when one is running
     try:
-      response = requests.get(f"{TOKEN_URL}?command=reset&token={token}")
-      return response.json()['response_code'] == 0
-    except:
-      return False
-    
-def get_categories():  # Get the categories
+        return broker_request('token')
+    except BrokerUnavailable:
+        return get_session_token_upstream()
+
+def get_categories():  # Get the categories, from the local broker when one is running
     try:
-        response = requests.get(CATEGORY_URL)
-        response.raise_for_status()
-        categories = response.json()['trivia_categories']
-        return {cat['id']: cat['name'] for cat in categories}
-    except:
-        return {}
+        return broker_request('categories') or {}
+    except BrokerUnavailable:
+        return get_categories_upstream()
 
 def select_bonus_category():   # Select the bonus category
     categories = get_categories()
@@ -69,39 +67,22 @@ def select_bonus_category():   # Select the bonus category
         return None
     return selected[choice-1][0]  
 
-def fetch_questions(token, amount=30, difficulty=None, category=None):     # Fetch the questions
-    params = {
-        'amount': amount,
-        'token': token,
-        'encode': 'url3986',   # Encode the URL
-        'type': 'multiple'
-    }
-    if difficulty: 
-        params['difficulty'] = difficulty
-    if category:
-        params['category'] = category
-    for _ in range(RETRY_CHANCE):  # Retry the request
+def fetch_questions(token, amount=30, difficulty=None, category=None):     # Fetch the questions, from the local broker when one is running
+    try:
+        questions = broker_request('questions', amount=amount, difficulty=difficulty, category=category)
+    except BrokerUnavailable:
         try:
-            response = requests.get(API_BASIC, params=params)   
-            response.raise_for_status()      # Raise an exception for bad status codes
-            data = response.json()  
-            if data['response_code'] == 0:   # Check if the response code is 0
-                valid_questions = []         # Initialize the valid questions list
-                for q in data['results']:  
-                    if len(q['incorrect_answers']) == 3:
-                        valid_questions.append(q)
-                if len(valid_questions) >= amount:   # Check if the number of valid questions is greater than or equal to the amount
-                    return valid_questions[:amount]   
-                else:
-                    return valid_questions   
-            elif data['response_code'] == 4:   
-                if reset_session_token(token):
-                    continue
-            print(f"Error: Response code {data['response_code']}")
-        except requests.exceptions.RequestException as e:   # Handle the exception if the request fails
-            print("Error in fetching questions:", str(e))
-        time.sleep(RETRY_DELAY)
-    return None
+            questions = fetch_questions_upstream(token, amount, difficulty, category)
+        except TokenRejected:   # The caller asks for a new token
+            questions = None
+    return filter_question_pool(questions)
+
+def filter_question_pool(questions):   # Add the questions to the question bank, drop blocked ones and near duplicates
+    if not questions:
+        return questions
+    QUESTION_INDEX.add_many(questions)
+    allowed = [q for q in questions if not QUESTION_INDEX.is_blocked(q)]
+    return NEAR_DUPLICATES.select_round(allowed) or None
 
 def handle_api_errors(code, token):   # Handle the API errors
   errors = {
@@ -178,21 +159,23 @@ def game_loop(questions, bonus_category):   # Game loop
     score = 0
     wrong = 0
     best_score = load_best_score()
-    time_left = TIME_ANSWER_MAX
+    time_left = SETTINGS.TIME_ANSWER_MAX
     timer_paused = False
     pause_available = True
     host_ask_available = True
-    def countdown():   # Countdown
+    def countdown():   # Countdown, called every second by the shared timer wheel
         nonlocal time_left
-        while time_left > 0 and not timer_paused:
-            sleep(1)
-            time_left -= 1
+        if timer_paused:
+            return
+        time_left -= 1
         if time_left <= 0:
+            timer.cancel()
             print("\nTime's up！")
-    timer = threading.Thread(target=countdown)   # Create a thread for the countdown
-    timer.start()
+    timer = get_timer_wheel().schedule_repeating(1, countdown)   # No thread per countdown
     for i, q in enumerate(questions, 1):  # Process the question
         processed = process_question(q, bonus_category)    
+        if not processed:   # Skip invalid or blocked questions
+            continue
         if i < len(questions):
             difficulty = get_difficulty_choice()
             if not difficulty:
@@ -293,6 +276,8 @@ def process_question(raw_question, bonus_category=None):   # Process the questio
         return None   
     if len(raw_question['incorrect_answers']) != 3:
         return None  
+    if QUESTION_INDEX.is_blocked(raw_question):   # Banned after the question was fetched
+        return None
     return {
         'category': raw_question['category'],
         'question': html.unescape(raw_question['question']),
@@ -307,7 +292,7 @@ def process_question(raw_question, bonus_category=None):   # Process the questio
         'is_bonus': bonus_category and (raw_question['category'] == bonus_category)
     }
 
-def main():  
+def main(render_profile=RENDER_PROFILE, daily=False, source=None):  
     print(f"""
     ---------------------------------
       Quizzical - Version 2025.0
@@ -318,6 +303,22 @@ def main():
     print("\n⚠️ Make sure to MAXIMAZE the terminal size to ensure the game interface display correctly.")
     print("\n⚠️ Press ENTER to continue...")
     input()
+    journal = SessionJournal()
+    resumed = journal.load()   # Resume an interrupted game without any network request
+    if resumed:
+        if input("\nResume your previous game? (y/n)").lower() == 'y':
+            final_score = play_game(resumed, journal, render_profile)
+            print(f"\nFinal Score: {final_score}")
+            if input("\nPlay again? (y/n)").lower() != 'y':
+                return
+        else:
+            journal.clear()
+    if daily:
+        play_daily_challenge(journal, render_profile)
+        return
+    if source:
+        play_question_source(source, journal, render_profile)
+        return
     token = get_session_token()   # Get the session token
     if not token:
         print("Unable to connect to the server, please check the network")
@@ -326,6 +327,11 @@ def main():
         user_input = input("\nPress ENTER to start the game 👾 (or Q to quit) ")
         if user_input.lower() == 'q':
             break
+        if token == OFFLINE_TOKEN and UPSTREAM.closed:   # The API is back, a real token prevents repeats again
+            token = get_session_token() or token
+        changed = reload_settings()   # Tuning saved to the settings file applies from the next round
+        if changed:
+            print(f"Settings reloaded: {', '.join(changed)}")
         categories = get_categories()     # Get the categories
         if not categories:
             print("Failed to get categories")
@@ -333,16 +339,16 @@ def main():
         selected = random.sample(list(categories.items()), 4)
         
         def select_bonus_category_curses(stdscr):   # Select the bonus category
-            ui = QuizUI(stdscr)
+            ui = QuizUI(stdscr, render_profile)
             return ui.show_bonus_category_selection(selected)
         choice = curses.wrapper(select_bonus_category_curses)
         if not choice:
             continue   
         bonus_category = selected[choice-1][0]
-        questions = fetch_questions(token, amount=30, category=bonus_category)   # Fetch the questions
+        questions = fetch_questions(token, amount=SETTINGS.FETCH_BATCH_SIZE, category=bonus_category)   # Fetch the questions
         if not questions:
             token = get_session_token()
-            questions = fetch_questions(token, amount=30, category=bonus_category)
+            questions = fetch_questions(token, amount=SETTINGS.FETCH_BATCH_SIZE, category=bonus_category)
             if not questions:
                 print("Failed to obtain questions, please try again later")
                 continue
@@ -353,20 +359,120 @@ def main():
             'questions': questions,
             'bonus_category': bonus_category,
             'best_score': load_best_score(),
-            'time_left': TIME_ANSWER_MAX,
+            'time_left': SETTINGS.TIME_ANSWER_MAX,
             'hints_remaining': 1,   
             'pauses_remaining': 1,
-            'score': 0
+            'score': 0,
+            'wrong_answers': 0
         }
-        final_score = curses.wrapper(partial(
-            curses_main,
-            game_logic=game_state,
-            process_question=process_question,
-            calculate_score=calculate_score
-        ))
+        final_score = play_game(game_state, journal, render_profile)
         print(f"\nFinal Score: {final_score}")
         if input("\nPlay again? (y/n)").lower() != 'y':
             break
 
+def play_game(game_state, journal, render_profile=RENDER_PROFILE):   # Run one game on the curses screen with checkpointing
+    history = GameHistory(daily=game_state.get('daily'))
+    final_score = curses.wrapper(partial(
+        curses_main,
+        game_logic=game_state,
+        process_question=daily_challenge.play_question if game_state.get('daily') else process_question,
+        calculate_score=calculate_score,
+        get_session_token=get_session_token,
+        get_categories=get_categories,
+        fetch_questions=fetch_questions,
+        journal=journal,
+        render_profile=render_profile,
+        history=history
+    ))
+    journal.clear()   # The game ended normally, nothing to resume
+    history.end_game(final_score)   # Games left with Q have not been recorded yet
+    return final_score
+
+def play_daily_challenge(journal, render_profile=RENDER_PROFILE):   # Play today's challenge, built once and cached on disk
+    day = daily_challenge.today()
+    challenge = daily_challenge.get_daily_challenge(day, get_session_token, get_categories, fetch_questions)
+    if not challenge:
+        print("Failed to prepare today's challenge, please try again later")
+        return
+    print(f"\nDaily challenge {day} 📅 Bonus category: {challenge['bonus_name']}")
+    input("Press ENTER to start ")
+    game_state = {
+        'questions': challenge['questions'],
+        'bonus_category': challenge['bonus_name'],
+        'best_score': load_best_score(),
+        'hints_remaining': 1,
+        'pauses_remaining': 1,
+        'score': 0,
+        'wrong_answers': 0,
+        'daily': day,
+        'rankingboard_file': daily_challenge.rankingboard_path(day)
+    }
+    final_score = play_game(game_state, journal, render_profile)
+    print(f"\nFinal Score: {final_score}")
+
+def open_question_source(path):   # Stream questions from a file through the same checks as fetched questions
+    questions = pipeline(
+        FileSource(path),
+        validate_stage(),
+        filter_stage(lambda q: not QUESTION_INDEX.is_blocked(q)),
+        dedup_stage(lambda q: NEAR_DUPLICATES.add(question_id(q), question_text(q), question_answer(q))),
+        shuffle_stage()
+    )
+    return QuestionStream(Prefetcher(questions, SETTINGS.PREFETCH_DEPTH))   # Prepared in the background, a few questions ahead
+
+def play_question_source(path, journal, render_profile=RENDER_PROFILE):   # Play questions streamed from a local file
+    questions = open_question_source(path)
+    try:
+        try:
+            if not questions:
+                print(f"No valid questions in {path}")
+                return
+        except OSError as e:   # Missing or unreadable file, raised by the prefetch thread
+            print(f"Cannot read {path}: {e.strerror or e}")
+            return
+        game_state = {
+            'questions': questions,
+            'bonus_category': None,
+            'best_score': load_best_score(),
+            'hints_remaining': 1,
+            'pauses_remaining': 1,
+            'score': 0,
+            'wrong_answers': 0
+        }
+        final_score = play_game(game_state, journal, render_profile)
+        print(f"\nFinal Score: {final_score}")
+    finally:
+        questions.close()
+
+def parse_args(argv=None):   # Parse the command line options
+    parser = argparse.ArgumentParser(description="Quizzical - a terminal trivia game")
+    parser.add_argument('--daily', action='store_true',
+                        help="Play today's daily challenge: the same questions for everyone, with its own ranking board")
+    parser.add_argument('--source', metavar='PATH',
+                        help="Play questions streamed from a local file (JSON list or JSON lines, e.g. question_bank.jsonl)")
+    parser.add_argument('--low-bandwidth', action='store_true',
+                        help="Use compact frames and a lower frame rate for slow connections")
+    parser.add_argument('--profile', nargs='?', const='sample', choices=['sample', 'cprofile'],
+                        help="Profile the session (sampling by default) and write the reports to files")
+    parser.add_argument('--profile-dir', default=PROFILE_DIR,
+                        help=f"Directory for the profile reports (default: {PROFILE_DIR})")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Also record memory allocations with tracemalloc (needs --profile)")
+    parser.add_argument('--settings', metavar='PATH',
+                        help=f"Settings file, reloaded between rounds when it changes (default: {SETTINGS_FILE})")
+    parser.add_argument('--set', action='append', metavar='NAME=VALUE',
+                        help="Override a setting such as FETCH_BATCH_SIZE=40, may be repeated (see settings.py)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    try:
+        SETTINGS.configure(args.settings, args.set)
+    except SettingsError as e:
+        raise SystemExit(f"Invalid setting: {e}")
+    apply_settings()
+    session = partial(main, render_profile='low' if args.low_bandwidth else RENDER_PROFILE, daily=args.daily, source=args.source)
+    if args.profile:
+        run_profiled(session, mode=args.profile, output_dir=args.profile_dir, trace_memory=args.trace_memory)
+    else:
+        session()
\ No newline at end of file
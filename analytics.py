@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import zlib
+import numpy as np
+from config import GAME_HISTORY_FILE, ANALYTICS_CACHE_FILE, ANALYTICS_REPORT_FILE
+from question_index import decode_text
+
+DIFFICULTIES = ['easy', 'medium', 'hard']
+HOST_CODES = {None: -1, 'none': 0, 'wrong': 1, 'right': 2}   # What the host said, -1 when not asked
+TOO_HARD_ACCURACY = 0.35   # Category/difficulty cells below this accuracy are flagged
+MIN_ANSWERS = 20           # Cells with fewer answers are not flagged
+FINGERPRINT_BYTES = 4096   # Leading bytes of the history checked before the cache is trusted
+ANSWER_COLUMNS = {'category': np.int32, 'difficulty': np.int8, 'correct': bool, 'timed_out': bool,
+                  'time_taken': np.float32, 'hint': bool, 'host': np.int8, 'bonus': bool, 'points': np.int16}
+GAME_COLUMNS = {'score': np.int32, 'answered': np.int32, 'daily': bool}
+
+def fingerprint(path, offset):   # Identifies the history file the cache was built from, None when it is gone or shorter
+    try:
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            head = f.read(min(offset, FINGERPRINT_BYTES))
+    except OSError:
+        return None
+    if stat.st_size < offset:   # Truncated or replaced by a shorter file
+        return None
+    return [os.path.abspath(path), str(stat.st_dev), str(stat.st_ino), str(zlib.crc32(head))]
+
+class History:   # Game history as columnar arrays
+    def __init__(self):
+        self.offset = 0   # Bytes of the history file already loaded
+        self.categories = []
+        self.answers = {name: np.zeros(0, dtype) for name, dtype in ANSWER_COLUMNS.items()}
+        self.games = {name: np.zeros(0, dtype) for name, dtype in GAME_COLUMNS.items()}
+
+    @classmethod
+    def load(cls, path=GAME_HISTORY_FILE, cache_path=ANALYTICS_CACHE_FILE):   # Load the cache, then only the new lines
+        history = cls()
+        if cache_path and os.path.exists(cache_path):
+            with np.load(cache_path, allow_pickle=False) as cache:
+                if 'source' in cache and cache['source'].tolist() == fingerprint(path, int(cache['offset'])):
+                    history.offset = int(cache['offset'])
+                    history.categories = cache['categories'].tolist()
+                    history.answers = {name: cache['answer_' + name] for name in ANSWER_COLUMNS}
+                    history.games = {name: cache['game_' + name] for name in GAME_COLUMNS}
+        if os.path.exists(path) and history.read(path) and cache_path:
+            history.save(cache_path, path)
+        return history
+
+    def read(self, path):   # Append the records written since the last load, returns True if there were any
+        with open(path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1   # Leave a line still being written for the next load
+        if not end:
+            return False
+        self.offset += end
+        codes = {name: i for i, name in enumerate(self.categories)}
+        answers = {name: [] for name in ANSWER_COLUMNS}
+        games = {name: [] for name in GAME_COLUMNS}
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('type') == 'answer':
+                category = decode_text(record['category'])
+                if category not in codes:
+                    codes[category] = len(self.categories)
+                    self.categories.append(category)
+                answers['category'].append(codes[category])
+                answers['difficulty'].append(DIFFICULTIES.index(record['difficulty']) if record['difficulty'] in DIFFICULTIES else -1)
+                answers['host'].append(HOST_CODES.get(record['host'], -1))
+                for name in ('correct', 'timed_out', 'time_taken', 'hint', 'bonus', 'points'):
+                    answers[name].append(record[name])
+            elif record.get('type') == 'game':
+                games['score'].append(record['score'])
+                games['answered'].append(record['answered'])
+                games['daily'].append(bool(record.get('daily')))
+        for name, dtype in ANSWER_COLUMNS.items():
+            self.answers[name] = np.concatenate([self.answers[name], np.array(answers[name], dtype=dtype)])
+        for name, dtype in GAME_COLUMNS.items():
+            self.games[name] = np.concatenate([self.games[name], np.array(games[name], dtype=dtype)])
+        return True
+
+    def save(self, cache_path, path=GAME_HISTORY_FILE):   # Save the columns so the next load only parses new lines
+        arrays = {'answer_' + name: column for name, column in self.answers.items()}
+        arrays.update({'game_' + name: column for name, column in self.games.items()})
+        temp_path = cache_path + '.tmp.npz'
+        np.savez(temp_path, offset=np.int64(self.offset), categories=np.array(self.categories, dtype=str),
+                 source=np.array(fingerprint(path, self.offset), dtype=str), **arrays)
+        os.replace(temp_path, cache_path)
+
+def rate(hits, total):   # Ratio as a percentage, '-' when there is no data
+    return f"{100 * hits / total:5.1f}%" if total else "    -"
+
+def accuracy_table(history):   # Accuracy by category and difficulty, with the too hard cells flagged
+    a = history.answers
+    known = a['difficulty'] >= 0
+    cells = a['category'][known].astype(np.int64) * 3 + a['difficulty'][known]
+    size = len(history.categories) * 3
+    totals = np.bincount(cells, minlength=size).reshape(-1, 3)
+    correct = np.bincount(cells, weights=a['correct'][known], minlength=size).reshape(-1, 3)
+    lines = ["Accuracy by category and difficulty (answers)", f"{'category':<40} {'easy':>14} {'medium':>14} {'hard':>14}"]
+    too_hard = []
+    for i in np.argsort(-totals.sum(axis=1)):
+        row = []
+        for d, name in enumerate(DIFFICULTIES):
+            row.append(f"{rate(correct[i, d], totals[i, d])} ({totals[i, d]:>5})")
+            if totals[i, d] >= MIN_ANSWERS and correct[i, d] / totals[i, d] < TOO_HARD_ACCURACY:
+                too_hard.append(f"  {history.categories[i]} / {name}: {rate(correct[i, d], totals[i, d])} of {totals[i, d]}")
+        lines.append(f"{history.categories[i][:40]:<40} {row[0]:>14} {row[1]:>14} {row[2]:>14}")
+    lines += ['', f"Too hard (accuracy below {TOO_HARD_ACCURACY:.0%}, at least {MIN_ANSWERS} answers)"]
+    return lines + (too_hard or ["  none"])
+
+def time_table(history):   # Answer time percentiles, timeouts excluded
+    a = history.answers
+    lines = ["Answer time (seconds)", f"{'difficulty':<10} {'p10':>7} {'p50':>7} {'p90':>7} {'p99':>7} {'timeouts':>9}"]
+    for d, name in [(None, 'all')] + list(enumerate(DIFFICULTIES)):
+        selected = np.ones(len(a['correct']), bool) if d is None else a['difficulty'] == d
+        answered = selected & ~a['timed_out']
+        if not answered.any():
+            continue
+        p = np.percentile(a['time_taken'][answered], [10, 50, 90, 99])
+        lines.append(f"{name:<10} {p[0]:7.1f} {p[1]:7.1f} {p[2]:7.1f} {p[3]:7.1f} {rate(a['timed_out'][selected].sum(), selected.sum()):>9}")
+    return lines
+
+def help_table(history):   # Accuracy with and without the hint, and after each kind of host answer
+    a = history.answers
+    lines = ["Hints and host", f"{'':<28} {'answers':>8} {'accuracy':>9}"]
+    groups = [('no hint, no host', ~a['hint'] & (a['host'] < 0)), ('hint used', a['hint']),
+              ('host asked', a['host'] >= 0), ("host suggested the answer", a['host'] == HOST_CODES['right']),
+              ("host suggested a wrong one", a['host'] == HOST_CODES['wrong']), ('host had no idea', a['host'] == HOST_CODES['none'])]
+    for name, selected in groups:
+        lines.append(f"{name:<28} {selected.sum():>8} {rate(a['correct'][selected].sum(), selected.sum()):>9}")
+    asked = a['host'] >= 0
+    lines.append(f"Host right when asked: {rate((a['host'] == HOST_CODES['right']).sum(), asked.sum())}")
+    return lines
+
+def score_table(history):   # Distribution of the final scores
+    g = history.games
+    if not len(g['score']):
+        return ["Scores", "  no finished games"]
+    scores = g['score']
+    p = np.percentile(scores, [25, 50, 75, 90])
+    lines = ["Scores",
+             f"games {len(scores)} (daily {g['daily'].sum()}), mean {scores.mean():.1f}, max {scores.max()}, "
+             f"answers per game {g['answered'].mean():.1f}",
+             f"p25 {p[0]:.0f}  p50 {p[1]:.0f}  p75 {p[2]:.0f}  p90 {p[3]:.0f}"]
+    counts, edges = np.histogram(scores, bins=min(10, max(1, int(scores.max()) + 1)))
+    width = 40 / max(counts.max(), 1)
+    for count, low, high in zip(counts, edges[:-1], edges[1:]):
+        lines.append(f"{low:6.0f}-{high:<6.0f} {'#' * int(count * width):<40} {count}")
+    return lines
+
+def build_report(history):   # Every section of the report
+    lines = [f"Quizzical analytics: {len(history.answers['correct'])} answers, {len(history.games['score'])} games", '']
+    for section in (accuracy_table, time_table, help_table, score_table):
+        lines += section(history) + ['']
+    return '\n'.join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze the recorded game history")
+    parser.add_argument('--history', default=GAME_HISTORY_FILE, help=f"History file (default: {GAME_HISTORY_FILE})")
+    parser.add_argument('--output', default=ANALYTICS_REPORT_FILE, help=f"Report file (default: {ANALYTICS_REPORT_FILE})")
+    parser.add_argument('--no-cache', action='store_true', help="Parse the whole history instead of using the columnar cache")
+    args = parser.parse_args()
+    history = History.load(args.history, None if args.no_cache else ANALYTICS_CACHE_FILE)
+    report = build_report(history)
+    with open(args.output, 'w') as f:
+        f.write(report)
+    print(f"Report written to {args.output}")
@@ -0,0 +1,110 @@
+import argparse
+import time
+from virtual_screen import VirtualScreen, headless_curses
+from curses_ui import QuizUI
+from config import RENDER_PROFILE, LOW_BANDWIDTH_BUDGET_BPS
+
+SAMPLE_QUESTION = "Which%20planet%20in%20our%20solar%20system%20has%20the%20most%20confirmed%20moons%3F"
+SAMPLE_ANSWERS = ["Saturn", "Jupiter", "Uranus", "Neptune"]
+RESULT_MESSAGE_SECONDS = 1   # How long curses_main shows "Correct!" or "Wrong!" (show_message's wait_time)
+
+def make_ui(height, width, render_profile=RENDER_PROFILE):   # Build a QuizUI drawing into a virtual screen
+    screen = VirtualScreen(height, width)
+    ui = QuizUI(screen, render_profile)
+    ui.current_question = SAMPLE_QUESTION
+    ui.options = SAMPLE_ANSWERS
+    ui.current_score = 12
+    ui.best_score = 30
+    return screen, ui
+
+def time_call(func, *args):   # Run func once and return the elapsed seconds
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def question_transition(screen, ui):   # Screens between two questions, as drawn by curses_main
+    ui.show_message("Correct! (+10 points)", 'correct', wait_time=0)
+    screen.keys.append(ord('1'))   # The player picks the next difficulty at once
+    ui.show_difficulty_choice()
+
+def run_benchmark(seconds=20, height=40, width=120, render_profile=RENDER_PROFILE, questions=3):   # Render answer periods and the transitions between them
+    screen, ui = make_ui(height, width, render_profile)
+    fps = round(1 / ui.refresh_interval)
+    timings = {'draw_header': 0.0, 'draw_question': 0.0, 'draw_footer': 0.0, 'frame': 0.0, 'transition': 0.0}
+    frames = 0
+    for question in range(questions):
+        if question:
+            timings['transition'] += time_call(question_transition, screen, ui)
+        for i in range(seconds * fps):
+            remaining = seconds - i // fps   # The timer ticks once per second
+            if i % (2 * fps) == fps:         # The player moves the selection every other second
+                ui.current_selection = (ui.current_selection + 1) % len(ui.options)
+            frame_start = time.perf_counter()
+            if i == 0:
+                ui.clear_screen()            # curses_main blanks the screen before each question
+            else:
+                screen.erase()
+            timings['draw_header'] += time_call(ui.draw_header, ui.current_score, ui.best_score, remaining)
+            timings['draw_question'] += time_call(ui.draw_question, ui.current_question, ui.options)
+            timings['draw_footer'] += time_call(ui.draw_footer, ui.hints_remaining, ui.pauses_remaining)
+            screen.noutrefresh()
+            timings['frame'] += time.perf_counter() - frame_start
+            frames += 1
+    return screen, timings, frames
+
+def report(screen, timings, frames, seconds, render_profile, questions=3):   # Print the benchmark results
+    repaint = screen.stats[1:] or screen.stats   # The first frame is a full repaint
+    seconds = questions * seconds + (questions - 1) * RESULT_MESSAGE_SECONDS   # Play time, transitions included
+    print(f"Frames: {frames} over {seconds}s, {questions} questions, on a {screen.height}x{screen.width} virtual screen ({render_profile} profile)")
+    for name, total in timings.items():
+        if name == 'transition':
+            if questions > 1:
+                print(f"  {name:<14} {total / (questions - 1) * 1e6:9.1f} us/transition")
+            continue
+        print(f"  {name:<14} {total / frames * 1e6:9.1f} us/frame")
+    print(f"  first frame    {screen.stats[0]['cells']:6d} cells {screen.stats[0]['bytes']:7d} bytes")
+    print(f"  repaint avg    {sum(s['cells'] for s in repaint) / len(repaint):6.1f} cells "
+          f"{sum(s['bytes'] for s in repaint) / len(repaint):7.1f} bytes")
+    print(f"  repaint max    {max(s['cells'] for s in repaint):6d} cells {max(s['bytes'] for s in repaint):7d} bytes")
+    rate = sum(s['bytes'] for s in screen.stats) / seconds
+    print(f"  bandwidth      {rate:9.1f} bytes/s (first frame included)")
+    if render_profile == 'low':
+        within = rate <= LOW_BANDWIDTH_BUDGET_BPS
+        print(f"  budget         {LOW_BANDWIDTH_BUDGET_BPS:9d} bytes/s -> {'OK' if within else 'OVER BUDGET'}")
+        return within
+    return True
+
+def check_snapshot(screen, path, update=False):   # Compare the first frame with a saved text snapshot
+    text = '\n'.join(screen.snapshot(0)) + '\n'
+    if update:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"Snapshot written to {path}")
+        return True
+    with open(path, 'r', encoding='utf-8') as f:
+        expected = f.read()
+    if expected == text:
+        print("Snapshot matches")
+        return True
+    for y, (old, new) in enumerate(zip(expected.split('\n'), text.split('\n'))):
+        if old != new:
+            print(f"Row {y}:\n  - {old}\n  + {new}")
+    return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark QuizUI rendering on a virtual screen")
+    parser.add_argument('--seconds', type=int, default=20, help="Seconds of each answer period to simulate")
+    parser.add_argument('--questions', type=int, default=3, help="Questions to simulate, with the screens between them")
+    parser.add_argument('--render-profile', choices=['full', 'low'], default=RENDER_PROFILE)
+    parser.add_argument('--height', type=int, default=40)
+    parser.add_argument('--width', type=int, default=120)
+    parser.add_argument('--snapshot', help="Compare the first frame with this text file")
+    parser.add_argument('--update-snapshot', action='store_true', help="Write the snapshot file instead of comparing")
+    args = parser.parse_args()
+    with headless_curses():
+        screen, timings, frames = run_benchmark(args.seconds, args.height, args.width, args.render_profile, args.questions)
+    within = report(screen, timings, frames, args.seconds, args.render_profile, args.questions)
+    if args.snapshot and not check_snapshot(screen, args.snapshot, args.update_snapshot):
+        raise SystemExit(1)
+    if not within:
+        raise SystemExit(1)
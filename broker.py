@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import random
+import socket
+import socketserver
+import stat
+import threading
+import time
+from settings import SETTINGS, SettingsError
+from opentdb import UPSTREAM, reload_settings, get_session_token_upstream, get_categories_upstream, fetch_questions_upstream, TokenRejected
+from config import (
+    BROKER_SOCKET,
+    API_MIN_INTERVAL,
+    OFFLINE_TOKEN
+)
+
+class BrokerUnavailable(Exception):   # Raised when no broker is listening on the socket, the caller may go upstream
+    pass
+
+def socket_problem(socket_path):   # Why a socket cannot be trusted, None when it can
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    try:
+        dir_stat = os.stat(directory)
+        sock_stat = os.lstat(socket_path)
+    except OSError as e:
+        return str(e)
+    if dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):   # Anyone could replace the socket, e.g. in /tmp
+        return f"{directory} is writable by other users"
+    if not stat.S_ISSOCK(sock_stat.st_mode) or sock_stat.st_uid != dir_stat.st_uid:
+        return f"{socket_path} is not a socket of the owner of {directory}"
+    return None
+
+def broker_request(op, socket_path=BROKER_SOCKET, timeout=None, **params):   # Send one request to the local broker
+    if not socket_path or not os.path.exists(socket_path):
+        raise BrokerUnavailable(socket_path)
+    problem = socket_problem(socket_path)
+    if problem:   # Never take tokens or questions from a socket another user may control
+        raise BrokerUnavailable(problem)
+    request = json.dumps({'op': op, **params}).encode() + b'\n'
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout or SETTINGS.BROKER_TIMEOUT)
+        try:
+            sock.connect(socket_path)
+        except socket.timeout:   # Listening but busy, see below
+            return None
+        except OSError as e:     # A dead socket file, no broker is listening
+            raise BrokerUnavailable(str(e))
+        try:
+            sock.sendall(request)
+            with sock.makefile('rb') as reader:
+                reply = json.loads(reader.readline())
+        except (OSError, ValueError):   # A slow or broken broker is still there, going upstream would bring back the rate limit storm
+            return None
+    if not isinstance(reply, dict) or not reply.get('ok'):
+        return None
+    result = reply.get('result')
+    if op == 'categories' and result:   # JSON object keys are strings, the game uses integer ids
+        result = {int(k): v for k, v in result.items()}
+    return result
+
+class SingleFlight:   # Coalesce concurrent calls with the same key into a single call
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, func):   # Run func once per key, concurrent callers wait for its result
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None}
+                self.calls[key] = call
+        if not leader:
+            call['done'].wait()
+            return call['result']
+        try:
+            call['result'] = func()
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['done'].set()
+        return call['result']
+
+class QuestionBroker:
+    def __init__(self, ttl=None, pool_size=None, pool_max=None):
+        self.fixed = {'ttl': ttl, 'pool_size': pool_size, 'pool_max': pool_max}   # Arguments given here win over the settings
+        self.apply_settings()
+        self.token = None
+        self.categories = None
+        self.categories_time = 0
+        self.pools = {}              # (category, difficulty) -> {'questions', 'time': fetched at, 'retry_at', 'failures'}
+        self.flight = SingleFlight()
+        self.upstream_lock = threading.Lock()
+        self.last_upstream = 0
+
+    def apply_settings(self):   # Take the current settings, called again whenever they are reloaded
+        self.ttl = SETTINGS.BROKER_CACHE_TTL if self.fixed['ttl'] is None else self.fixed['ttl']
+        self.pool_size = self.fixed['pool_size'] or SETTINGS.BROKER_POOL_SIZE   # Questions requested from upstream per refill
+        self.pool_max = self.fixed['pool_max'] or SETTINGS.BROKER_POOL_MAX      # Upper bound of questions kept per (category, difficulty)
+
+    def _upstream(self, func, *args, **kwargs):   # Serialize upstream calls and respect the API rate limit
+        if not UPSTREAM.closed:   # The API is down, func answers from the local caches at once
+            return func(*args, **kwargs)
+        with self.upstream_lock:
+            wait = API_MIN_INTERVAL - (time.monotonic() - self.last_upstream)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.last_upstream = time.monotonic()
+
+    def get_token(self):   # The broker owns the single session token of the host
+        if not self.token or self.token == OFFLINE_TOKEN:   # Try for a real token again once the API is back
+            self.token = self.flight.do('token', lambda: self.token if self.token and self.token != OFFLINE_TOKEN
+                                        else self._upstream(get_session_token_upstream))
+        return self.token
+
+    def get_categories(self):   # Cached categories
+        if self.categories and time.monotonic() - self.categories_time < self.ttl:
+            return self.categories
+        def refresh():
+            categories = self._upstream(get_categories_upstream)
+            if categories:
+                self.categories = categories
+                self.categories_time = time.monotonic()
+            return self.categories
+        return self.flight.do('categories', refresh)
+
+    def _refill(self, key):   # Fetch a new batch for one pool and merge it with the cached questions
+        category, difficulty = key
+        try:
+            batch = self._upstream(fetch_questions_upstream, self.get_token(), amount=self.pool_size,
+                                   difficulty=difficulty, category=category)
+        except TokenRejected:   # Only a rejected token is replaced, retry once with a new one
+            self.token = None
+            try:
+                batch = self._upstream(fetch_questions_upstream, self.get_token(), amount=self.pool_size,
+                                       difficulty=difficulty, category=category)
+            except TokenRejected:
+                batch = None
+        now = time.monotonic()
+        pool = self.pools.get(key, {'questions': [], 'time': 0, 'retry_at': 0, 'failures': 0})
+        if batch:
+            known = {q['question'] for q in pool['questions']}
+            merged = pool['questions'] + [q for q in batch if q['question'] not in known]
+            short = len(batch) < self.pool_size   # The query has nothing more for now, serve what there is
+            pool = {'questions': merged[-self.pool_max:], 'time': now, 'failures': 0,
+                    'retry_at': now + self.ttl if short else now}
+        else:   # Back off exponentially so failing refills do not grow with the number of games
+            failures = pool['failures'] + 1
+            pool = dict(pool, failures=failures, retry_at=now + min(self.ttl, API_MIN_INTERVAL * 2 ** failures))
+        self.pools[key] = pool
+        return pool
+
+    def get_questions(self, amount=30, category=None, difficulty=None):   # Hand out a batch from the shared pool
+        key = (category, difficulty)
+        pool = self.pools.get(key)
+        now = time.monotonic()
+        wanted = not pool or len(pool['questions']) < amount or now - pool['time'] >= self.ttl
+        if wanted and (not pool or now >= pool['retry_at']):   # A failed or short refill is not repeated before retry_at
+            pool = self.flight.do(key, lambda: self._refill(key))
+        if not pool['questions']:
+            return None
+        return random.sample(pool['questions'], min(amount, len(pool['questions'])))
+
+    def handle(self, request):   # Dispatch one decoded request
+        if reload_settings():   # The broker runs for days, tuning applies without a restart
+            self.apply_settings()
+        op = request.get('op')
+        if op == 'token':
+            return self.get_token()
+        if op == 'categories':
+            return self.get_categories()
+        if op == 'questions':
+            return self.get_questions(request.get('amount', 30), request.get('category'), request.get('difficulty'))
+        raise ValueError(f"Unknown operation: {op}")
+
+class BrokerRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):   # One JSON request per line, one JSON reply per line
+        for line in self.rfile:
+            try:
+                result = self.server.broker.handle(json.loads(line))
+                reply = {'ok': result is not None, 'result': result}
+            except Exception as e:
+                reply = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+            self.wfile.flush()
+
+class BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128   # Dozens of games may connect at the same time
+
+    def __init__(self, socket_path, broker):
+        self.broker = broker
+        directory = os.path.dirname(os.path.abspath(socket_path))
+        os.makedirs(directory, mode=0o755, exist_ok=True)
+        dir_stat = os.stat(directory)
+        if dir_stat.st_uid != os.geteuid() or dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise PermissionError(f"{directory} must belong to this user and not be writable by others")
+        if os.path.exists(socket_path):
+            try:   # Refuse to take over the socket of a running broker
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.connect(socket_path)
+                raise FileExistsError(f"A broker is already listening on {socket_path}")
+            except ConnectionRefusedError:   # Left behind by a previous broker
+                os.unlink(socket_path)
+        super().__init__(socket_path, BrokerRequestHandler)
+        os.chmod(socket_path, 0o666)      # Every player on the host may connect, only this user can replace it
+
+def serve(socket_path=BROKER_SOCKET):   # Run the broker until interrupted
+    try:
+        server = BrokerServer(socket_path, QuestionBroker())
+    except OSError as e:
+        raise SystemExit(f"Cannot start the broker: {e}")
+    print(f"Quizzical broker listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local question broker shared by all Quizzical games on this host")
+    parser.add_argument('--socket', default=BROKER_SOCKET, help=f"Unix socket path (default: {BROKER_SOCKET})")
+    parser.add_argument('--settings', metavar='PATH', help="Settings file, reloaded when it changes (see settings.py)")
+    parser.add_argument('--set', action='append', metavar='NAME=VALUE', help="Override a setting, may be repeated")
+    args = parser.parse_args()
+    try:
+        SETTINGS.configure(args.settings, args.set)
+    except SettingsError as e:
+        raise SystemExit(f"Invalid setting: {e}")
+    serve(args.socket)
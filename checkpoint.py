@@ -0,0 +1,84 @@
+import json
+import os
+from config import CHECKPOINT_FILE, CHECKPOINT_COMPACT_EVERY
+
+STATE_KEYS = ('questions', 'bonus_category', 'best_score', 'hints_remaining', 'pauses_remaining', 'score', 'wrong_answers',
+              'daily', 'rankingboard_file')
+
+class SessionJournal:   # Write-ahead journal of the game state: one snapshot followed by one line per answer
+    def __init__(self, path=CHECKPOINT_FILE, compact_every=CHECKPOINT_COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every   # Answer records appended before the journal is compacted
+        self.records = 0
+
+    def _append(self, record):   # Append one record and make sure it reaches the disk
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def snapshot(self, game_logic):   # Replace the journal with a single snapshot of the game state
+        state = {key: game_logic.get(key) for key in STATE_KEYS}
+        state['questions'] = state['questions'] or []
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(json.dumps({'type': 'snapshot', 'state': state}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)   # Atomic, a crash leaves either the old or the new journal
+        self.records = 0
+
+    def record_answer(self, game_logic):   # Record that the head question was answered
+        if self.records >= self.compact_every:
+            self.snapshot(game_logic)      # game_logic already reflects the answer
+            return
+        questions = game_logic.get('questions') or []
+        self._append({
+            'type': 'answer',
+            'score': game_logic.get('score', 0),
+            'wrong_answers': game_logic.get('wrong_answers', 0),
+            'hints_remaining': game_logic.get('hints_remaining', 0),
+            'pauses_remaining': game_logic.get('pauses_remaining', 0),
+            'next_difficulty': questions[0].get('difficulty') if questions else None
+        })
+        self.records += 1
+
+    def record_skip(self):   # Record that the head question was dropped without being asked, e.g. a blocked one
+        self._append({'type': 'skip'})
+        self.records += 1
+
+    def load(self):   # Replay the journal, returns the game state or None when there is nothing to resume
+        state = None
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:   # A torn last line from a crash mid-write
+                        break
+                    if record.get('type') == 'snapshot':
+                        state = record['state']
+                    elif record.get('type') == 'answer' and state:
+                        if state['questions']:
+                            state['questions'].pop(0)
+                        for key in ('score', 'wrong_answers', 'hints_remaining', 'pauses_remaining'):
+                            state[key] = record[key]
+                        if record['next_difficulty'] and state['questions']:
+                            state['questions'][0]['difficulty'] = record['next_difficulty']
+                        self.records += 1
+                    elif record.get('type') == 'skip' and state:
+                        if state['questions']:
+                            state['questions'].pop(0)
+                        self.records += 1
+        except OSError:
+            return None
+        if not state or not state.get('questions') or (state.get('wrong_answers') or 0) >= 3:
+            return None
+        return state
+
+    def clear(self):   # Remove the journal once the game has ended normally
+        self.records = 0
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
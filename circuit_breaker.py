@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+import time
+from config import CIRCUIT_FAILURES, CIRCUIT_RESET_TIMEOUT
+
+CLOSED = 'closed'         # Calls go upstream
+OPEN = 'open'             # Calls fail at once, callers serve cached data
+HALF_OPEN = 'half-open'   # A background probe decides whether to close again
+
+class CircuitOpen(Exception):   # Raised instead of calling a service known to be down
+    pass
+
+class CircuitBreaker:   # Stops calling a failing service, probes it in the background until it recovers
+    def __init__(self, probe, failures=CIRCUIT_FAILURES, reset_timeout=CIRCUIT_RESET_TIMEOUT, state_path=None):
+        self.probe = probe                  # Returns True when the service answers again
+        self.failures = failures            # Consecutive failures that open the circuit
+        self.reset_timeout = reset_timeout  # Seconds the circuit stays open before a probe
+        self.state_path = state_path        # File sharing the open state with the other processes of the host
+        self.state_mtime = None
+        self.state = CLOSED
+        self.failure_count = 0
+        self.opened_at = 0
+        self.lock = threading.Lock()
+        with self.lock:
+            self._sync()
+
+    @property
+    def closed(self):
+        return self.state == CLOSED
+
+    def _sync(self):   # Adopt the state saved by another process since the last check, called with the lock held
+        if not self.state_path:
+            return
+        try:
+            mtime = os.stat(self.state_path).st_mtime_ns
+            if mtime == self.state_mtime:
+                return
+            with open(self.state_path, 'r') as f:
+                saved = json.load(f)
+            self.state_mtime = mtime
+        except (OSError, ValueError):
+            return
+        if saved.get('state') == OPEN and self.state == CLOSED:
+            self.state = OPEN
+            self.opened_at = time.monotonic() - max(0, time.time() - saved.get('opened_at', 0))   # Saved as wall clock time
+        elif saved.get('state') == CLOSED and self.state == OPEN:
+            self.state = CLOSED
+            self.failure_count = 0
+
+    def _save(self):   # Share the state with the other processes, called with the lock held
+        if not self.state_path:
+            return
+        saved = {'state': CLOSED if self.state == CLOSED else OPEN,
+                 'opened_at': time.time() - (time.monotonic() - self.opened_at)}
+        temp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(saved, f)
+            os.replace(temp_path, self.state_path)   # Atomic, readers never see a partial file
+            self.state_mtime = os.stat(self.state_path).st_mtime_ns
+        except OSError:   # Sharing is best effort, this process keeps its own state
+            pass
+
+    def allow(self):   # True if a call may go upstream, never waits for the probe
+        with self.lock:
+            self._sync()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                threading.Thread(target=self._run_probe, daemon=True).start()
+            return False
+
+    def _run_probe(self):   # Half-open: one probe closes the circuit or opens it for another period
+        try:
+            recovered = self.probe()
+        except Exception:
+            recovered = False
+        with self.lock:
+            if recovered:
+                self.state = CLOSED
+                self.failure_count = 0
+            else:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._save()
+
+    def record_success(self):
+        with self.lock:
+            self.failure_count = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failure_count += 1
+            if self.state == CLOSED and self.failure_count >= self.failures:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._save()
+
+    def call(self, func, *args, **kwargs):   # Run func through the breaker, exceptions count as failures
+        if not self.allow():
+            raise CircuitOpen()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
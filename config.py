@@ -2,11 +2,51 @@ import requests
 API_BASIC = "https://opentdb.com/api.php"
 TOKEN_URL = "https://opentdb.com/api_token.php"
 CATEGORY_URL = "https://opentdb.com/api_category.php"
+COUNT_URL = "https://opentdb.com/api_count.php"
 TIME_ANSWER_MAX = 20
 RETRY_CHANCE = 3
 RETRY_DELAY = 1
+SETTINGS_FILE = 'quizzical_settings.json'         # Optional overrides of the tunable settings, see settings.py
+POLL_INTERVAL = 0.01                              # Seconds between two keyboard polls
+RENDER_PROFILE = 'full'                           # 'full' or 'low' (compact frames for slow SSH links)
+FRAME_RATE_MAX = 10                               # Frames per second of the full render profile
+LOW_BANDWIDTH_FRAME_RATE = 4                      # Frames per second of the low bandwidth render profile
+LOW_BANDWIDTH_BUDGET_BPS = 1000                   # Bytes per second the low bandwidth profile must stay under
+TIMER_TICK = 0.1                                  # Seconds per tick of the timer wheel
+TIMER_WHEEL_SLOTS = 64                            # Slots per level of the timer wheel
+TIMER_WHEEL_LEVELS = 4                            # Levels of the timer wheel (64**4 ticks is about 19 days)
 SCORE_FILE = 'best_score.txt'
 RANKINGBOARD_FILE = 'rankingboard.json'
+QUESTION_BANK_FILE = 'question_bank.jsonl'       # Every question received, one JSON object per line
+BLOCKLIST_FILE = 'blocklist.json'                 # Banned question ids and words
+MINHASH_PERMUTATIONS = 64                         # MinHash signature length of the near-duplicate detector
+LSH_BANDS = 16                                    # LSH bands, more bands find less similar candidates
+NEAR_DUPLICATE_THRESHOLD = 0.6                    # Estimated Jaccard similarity above which questions are duplicates
+DAILY_DIR = 'daily'                               # Cached daily challenges and their ranking boards
+DAILY_QUESTIONS = 30                              # Questions in a daily challenge
+DAILY_BUILD_WAIT = 120                            # Seconds to wait for another process building the challenge
+FETCH_BATCH_SIZE = 30                             # Questions requested per batch from the API
+PREFETCH_DEPTH = 10                               # Questions a streaming source may prepare ahead of the player
+GAME_HISTORY_FILE = 'game_history.jsonl'          # Every answer and game, one JSON object per line
+ANALYTICS_CACHE_FILE = 'game_history.npz'         # Columnar copy of the history kept by analytics.py
+ANALYTICS_REPORT_FILE = 'analytics_report.txt'    # Report written by analytics.py
+CHECKPOINT_FILE = 'session.journal'               # Game state journal used to resume an interrupted game
+CHECKPOINT_COMPACT_EVERY = 20                     # Answers appended before the journal is rewritten as one snapshot
+API_MIN_INTERVAL = 5                              # OpenTDB allows one request per IP every 5 seconds
+API_MAX_AMOUNT = 50                               # OpenTDB returns at most 50 questions per call
+COUNTS_FILE = 'question_counts.json'              # Cached per-category question counts
+COUNTS_TTL = 24 * 3600                            # Seconds before the question counts are fetched again
+UPSTREAM_TIMEOUT = 10                             # Seconds before an API request counts as failed
+CIRCUIT_FAILURES = 3                              # Consecutive API failures before the game stops calling it
+CIRCUIT_RESET_TIMEOUT = 30                        # Seconds before a background probe checks whether the API is back
+CIRCUIT_STATE_FILE = 'circuit_state.json'         # Open state of the circuit, shared by the games and the broker of the host
+CATEGORIES_FILE = 'categories.json'               # Last categories received, served while the API is down
+OFFLINE_TOKEN = 'offline'                         # Session token handed out while the API is down
+BROKER_SOCKET = '/run/quizzical/broker.sock'      # Used when a broker is listening, its directory belongs to the broker user
+BROKER_TIMEOUT = 60                               # Seconds a game waits for the broker to answer
+BROKER_CACHE_TTL = 300                            # Seconds before the broker refreshes a question pool
+BROKER_POOL_SIZE = 50                             # Questions fetched per pool refill (API maximum)
+BROKER_POOL_MAX = 500                             # Questions kept per (category, difficulty) pool
 
 def load_best_score():   # Load the best score from the file
     try:
@@ -23,27 +63,27 @@ def update_best_score(score):   # Update the best score to the file
         return score
     return current_best
 
-def update_rankingboard(name, score):   # Update the ranking board to the file
+def update_rankingboard(name, score, filename=RANKINGBOARD_FILE):   # Update the ranking board to the file
     import json
     import os
     try:
         leaders = []  # Initialize the leaders list
-        if os.path.exists(RANKINGBOARD_FILE):
-            with open(RANKINGBOARD_FILE, 'r') as f:
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
                 leaders = json.load(f)
         leaders.append({'name': name, 'score': score})  # Append the new score to the leaders list
         leaders = sorted(leaders, key=lambda x: x['score'], reverse=True)[:10]
-        with open(RANKINGBOARD_FILE, 'w') as f:
+        with open(filename, 'w') as f:
             json.dump(leaders, f)
     except Exception as e:
         print(f"Failed to update Ranking Board: {str(e)}")
 
-def load_rankingboard():   # Load the ranking board from the file
+def load_rankingboard(filename=RANKINGBOARD_FILE):   # Load the ranking board from the file
     import json
     import os
     try:
-        if os.path.exists(RANKINGBOARD_FILE):
-            with open(RANKINGBOARD_FILE, 'r') as f:
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
                 return json.load(f)
         return []
     except:
@@ -1,17 +1,20 @@
 import curses
 import time
+import threading
 from functools import partial
 import urllib.parse
 import random
+from timer_wheel import get_timer_wheel
+from question_sources import QuestionStream
+from settings import SETTINGS
+from opentdb import reload_settings
 from config import (
-    TIME_ANSWER_MAX,
+    RENDER_PROFILE,
+    RANKINGBOARD_FILE,
     load_best_score,
     update_best_score,
     update_rankingboard,
-    load_rankingboard,
-    fetch_questions,
-    get_session_token,
-    get_categories
+    load_rankingboard
 )
 
 class QuizUI:
@@ -23,8 +26,10 @@ class QuizUI:
         'timer': 5
     }
 
-    def __init__(self, stdscr):   # Initialize the UI
+    def __init__(self, stdscr, render_profile=RENDER_PROFILE):   # Initialize the UI
         self.stdscr = stdscr
+        self.low_bandwidth = render_profile == 'low'   # Compact frames for slow links
+        self.update_refresh_interval()
         self.init_colors()
         self.win_height, self.win_width = stdscr.getmaxyx()
         self.current_selection = 0
@@ -39,8 +44,20 @@ class QuizUI:
         self.message_color = 'normal'  
         self.time_left = 0  
         self.timer = None
+        self.timer_ticket = None             # Identifies the current countdown, ticks of replaced ones are ignored
+        self.timer_lock = threading.Lock()   # start_timer runs on the game thread, _timer_tick on the wheel thread
+        self.timed_out = threading.Event()   # Set by the timer wheel when the answer time is up
         self.stop_timer = False 
 
+    def update_refresh_interval(self):   # Seconds between two frames, called again when the settings are reloaded
+        self.refresh_interval = 1 / (SETTINGS.LOW_BANDWIDTH_FRAME_RATE if self.low_bandwidth else SETTINGS.FRAME_RATE_MAX)
+
+    def refresh_settings(self):   # Apply the settings changed since the last game
+        changed = reload_settings(lambda message: self.show_message(message[:self.win_width - 1], 'wrong', 2))
+        if changed:
+            self.show_message(f"Settings reloaded: {', '.join(changed)}"[:self.win_width - 1])
+            self.update_refresh_interval()
+
     def init_colors(self):   # Initialize the colors 
         curses.start_color()
         curses.init_pair(self.COLORS['normal'], curses.COLOR_WHITE, curses.COLOR_BLACK)
@@ -50,7 +67,31 @@ class QuizUI:
         curses.init_pair(self.COLORS['timer'], curses.COLOR_CYAN, curses.COLOR_BLACK)
         curses.A_STRIKE = curses.A_UNDERLINE  
 
+    def attr(self, color, bold=False):   # Attribute for a color, the low bandwidth profile avoids switching
+        if self.low_bandwidth and color not in ('highlight', 'wrong'):
+            return curses.color_pair(self.COLORS['normal'])
+        return curses.color_pair(self.COLORS[color]) | (curses.A_BOLD if bold else 0)
+
+    def question_top(self):   # First row below the header
+        if self.low_bandwidth:
+            return 3
+        title_height = 6   
+        score_height = 2
+        padding = 3
+        return title_height + score_height + padding
+
+    def clear_screen(self):   # Blank the screen, a full clear() would resend every cell on the next refresh
+        if self.low_bandwidth:
+            self.stdscr.erase()
+        else:
+            self.stdscr.clear()
+
     def draw_header(self, score, best_score, time_left):  
+        if self.low_bandwidth:   # One line instead of the ASCII art banner
+            info_line = f" QUIZZICAL | Score: {score} | Best: {best_score} | Time: {int(time_left)}s"
+            self.stdscr.addstr(0, 0, info_line[:self.win_width - 1], self.attr('normal'))
+            self.stdscr.hline(1, 0, ord('-'), self.win_width)
+            return
         title = [
             " ██████  ██    ██ ██ ███████ ███████ ██  ██████  █████  ██      ",
             "██    ██ ██    ██ ██    ███     ███  ██ ██      ██   ██ ██      ",
@@ -73,10 +114,7 @@ class QuizUI:
         if not question or not options:
             return
         self.options = options
-        title_height = 6   
-        score_height = 2
-        padding = 3
-        question_start_y = title_height + score_height + padding
+        question_start_y = self.question_top()
         try:   # Decode the question and wrap the text
             decoded_question = urllib.parse.unquote(question)
             question_lines = self.wrap_text(decoded_question, self.win_width - 4)
@@ -102,6 +140,10 @@ class QuizUI:
             pass
 
     def draw_footer(self, hints_remaining, pauses_remaining):   # Draw the footer
+        if self.low_bandwidth:   # One line of controls at the bottom
+            controls = f" Up/Down Move | Enter Select | H Hint({hints_remaining}) | P Pause({pauses_remaining}) | A Ask | Q Quit"
+            self.stdscr.addstr(self.win_height - 1, 0, controls[:self.win_width - 1], self.attr('normal'))
+            return
         controls = [
             "┌─────────────────────── CONTROLS ────────────────────┐",
             "│  ↑/↓ - Navigate   |   A - Ask Host  |   Q - Quit    │",
@@ -125,30 +167,36 @@ class QuizUI:
                 start_x = (self.win_width - len(line)) // 2
                 self.stdscr.addstr(y_pos, start_x, line, curses.color_pair(self.COLORS['normal']) | curses.A_BOLD)
 
-    def start_timer(self):                              # Start the timer
-        import threading
-        self.stop_timer = True                          # Stop the former timer
-        if self.timer and self.timer.is_alive():
-            self.timer.join()
-        self.stop_timer = False
-        def timer_thread():                             # Timer thread
-            while not self.stop_timer and self.time_left > 0:
-                time.sleep(1)  
-                if not self.stop_timer and not self.pause_timer:
-                    self.time_left -= 1  
-        self.timer = threading.Thread(target=timer_thread)
-        self.timer.daemon = True
-        self.pause_timer = False
-        self.timer.start()
+    def start_timer(self):                              # Start the timer on the shared timer wheel
+        with self.timer_lock:
+            if self.timer:
+                self.timer.cancel()                     # Stop the former timer
+            self.stop_timer = False
+            self.pause_timer = False
+            self.timed_out.clear()
+            self.timer_ticket = ticket = object()
+            self.timer = get_timer_wheel().schedule_repeating(1, self._timer_tick, ticket)
+
+    def _timer_tick(self, ticket):                      # Runs once per second on the timer wheel thread
+        with self.timer_lock:
+            if ticket is not self.timer_ticket:         # Dispatched before its timer was replaced
+                return
+            if self.stop_timer:
+                self.timer.cancel()
+            elif not self.pause_timer and self.time_left > 0:
+                self.time_left -= 1
+                if self.time_left <= 0:                 # Deliver the timeout to get_input
+                    self.timer.cancel()
+                    self.timed_out.set()
 
     def get_input(self, timeout):   # Get the input
         self.time_left = timeout  
         self.start_timer()  
         self.stdscr.nodelay(True)   # Enable non-blocking input
         last_refresh = time.time()
-        refresh_interval = 0.1  
+        dirty = False   # A key changed the screen since the last frame
         while True:
-            if self.time_left <= 0:   # If the timer is up, refresh the screen and stop the timer
+            if self.timed_out.is_set() or self.time_left <= 0:   # If the timer is up, refresh the screen and stop the timer
                 self._refresh_screen(0)  
                 time.sleep(1)  
                 self.stop_timer = True  
@@ -156,16 +204,13 @@ class QuizUI:
             try:
                 key = self.stdscr.getch()    # Get the input
                 current_time = time.time()   # Current time
-                if current_time - last_refresh >= refresh_interval:   # Refresh the screen if the interval has passed
-                    self._refresh_screen(self.time_left)
-                    last_refresh = current_time
                 if key != -1:   
                     if key == curses.KEY_UP:  
                         self.current_selection = max(0, self.current_selection - 1)
-                        self._refresh_screen(self.time_left)
+                        dirty = True
                     elif key == curses.KEY_DOWN:   # Move down
                         self.current_selection = min(len(self.options) - 1, self.current_selection + 1)
-                        self._refresh_screen(self.time_left)
+                        dirty = True
                     elif key == curses.KEY_ENTER or key in [10, 13]:   # Select the option
                         self.stop_timer = True
                         return self.current_selection + 1
@@ -178,8 +223,13 @@ class QuizUI:
                         return 'pause'
                     elif key == ord('a') or key == ord('A'):   # Ask the host
                         return 'ask'
-                    self._refresh_screen(self.time_left)
-                time.sleep(0.01)  
+                    else:
+                        dirty = True
+                if current_time - last_refresh >= self.refresh_interval or (dirty and not self.low_bandwidth):
+                    self._refresh_screen(self.time_left)   # The low bandwidth profile caps the frame rate
+                    last_refresh = current_time
+                    dirty = False
+                time.sleep(SETTINGS.POLL_INTERVAL)
             except curses.error:
                 continue
 
@@ -196,12 +246,12 @@ class QuizUI:
             pass
 
     def show_message(self, message, color='normal', wait_time=1):   # Show the message
-        self.stdscr.clear()
+        self.clear_screen()
         lines = message.split('\n')
         for idx, line in enumerate(lines):
             y = self.win_height//2 - len(lines)//2 + idx
             x = self.win_width//2 - len(line)//2
-            self.stdscr.addstr(y, x, line, curses.color_pair(self.COLORS[color]))
+            self.stdscr.addstr(y, x, line, self.attr(color))
         self.stdscr.refresh()
         time.sleep(wait_time)  
 
@@ -211,7 +261,7 @@ class QuizUI:
         self._refresh_screen(self.time_left)  
 
     def show_difficulty_choice(self):   # Show the difficulty choice
-        self.stdscr.clear()
+        self.clear_screen()
         message = [
             "Choose difficulty for next question:",
             "",
@@ -236,7 +286,7 @@ class QuizUI:
                 continue
 
     def show_ranking_board(self, rankings, start_y=None):   
-        self.stdscr.clear()
+        self.clear_screen()
         if start_y is None:
             start_y = self.win_height//2 - 10  # Display from the middle to the top of the screen
         title = "🏆 RANKING BOARD 🏆"
@@ -283,7 +333,7 @@ class QuizUI:
         return lines
 
     def get_user_name(self):
-        self.stdscr.clear()
+        self.clear_screen()
         prompt = "Enter your name (max 20 chars): "
         y = self.win_height // 2
         x = (self.win_width - len(prompt)) // 2
@@ -309,7 +359,7 @@ class QuizUI:
         return name.strip() if name.strip() else "Anonymous"
 
     def show_game_over(self, final_score):   
-        self.stdscr.clear()
+        self.clear_screen()
         messages = [
             "Game Over! 🫠",
             f"Final Score: {final_score}",
@@ -339,7 +389,7 @@ class QuizUI:
         return to_remove
 
     def show_bonus_category_selection(self, categories):   # Show the bonus category selection
-        self.stdscr.clear()   
+        self.clear_screen()
         messages = [
             "Please select the bonus category",
             "(Get double points for correct answer!)",
@@ -363,23 +413,37 @@ class QuizUI:
 
     def draw_inline_message(self):   # Draw the inline message
         if self.current_message:
-            title_height = 6
-            score_height = 2
-            padding = 3
             question_lines = self.wrap_text(self.current_question, self.win_width - 4)
             options_height = len(self.options)
-            message_y = title_height + score_height + padding + len(question_lines) + options_height + 3   
+            message_y = self.question_top() + len(question_lines) + options_height + 3   
             if message_y < self.win_height - 5:
                 self.stdscr.addstr(message_y, 4, self.current_message,
                                  curses.color_pair(self.COLORS[self.message_color]))
 
-def curses_main(stdscr, game_logic, process_question, calculate_score):   # Main function
+def next_question(questions):   # Upcoming question of a list or a QuestionStream, without consuming it
+    return questions.peek() if isinstance(questions, QuestionStream) else questions[0]
+
+def curses_main(stdscr, game_logic, process_question, calculate_score, get_session_token, get_categories, fetch_questions,
+                journal=None, render_profile=RENDER_PROFILE, history=None):   # Main function, the network helpers go through the broker and the circuit breaker
     while True:               # Game loop
-        ui = QuizUI(stdscr)   # Initialize the UI
+        ui = QuizUI(stdscr, render_profile)   # Initialize the UI
         curses.curs_set(0)    # Hide the cursor
-        score = 0             # Initialize the score
-        wrong_answers = 0     # Initialize the wrong answers
+        ui.refresh_settings()  # Also done when "Play again" starts a new game
+        score = game_logic.get('score', 0)                   # Initialize the score, non-zero when resuming
+        wrong_answers = game_logic.get('wrong_answers', 0)   # Initialize the wrong answers
+        checkpoint = None if isinstance(game_logic['questions'], QuestionStream) else journal   # A stream cannot be replayed, see README
+        if checkpoint and game_logic['questions']:           # Checkpoint the starting state
+            checkpoint.snapshot(game_logic)
+        rankingboard_file = game_logic.get('rankingboard_file') or RANKINGBOARD_FILE
         while wrong_answers < 3:  
+            if not game_logic['questions'] and game_logic.get('daily'):   # The daily challenge is finished
+                if history:
+                    history.end_game(score)
+                name = ui.get_user_name()
+                if name:
+                    update_rankingboard(name, score, rankingboard_file)
+                ui.show_ranking_board(load_rankingboard(rankingboard_file))
+                return score
             if not game_logic['questions']:   # If the questions are not loaded
                 token = get_session_token()
                 if not token:
@@ -394,21 +458,33 @@ def curses_main(stdscr, game_logic, process_question, calculate_score):   # Main
                 if not choice:                                          # If the choice is not made
                     return score
                 bonus_category = selected[choice-1][0]   # Get the bonus category
-                game_logic['questions'] = fetch_questions(token, amount=30, category=bonus_category)
+                game_logic['bonus_category'] = bonus_category
+                game_logic['questions'] = fetch_questions(token, amount=SETTINGS.FETCH_BATCH_SIZE, category=bonus_category)
                 if not game_logic['questions']:          # If the questions are not loaded
                     ui.show_message("Failed to get questions!", 'wrong')
                     return score
+                checkpoint = journal                     # Fetched questions can be journaled again
+                if checkpoint:                           # Checkpoint the new questions
+                    checkpoint.snapshot(game_logic)
             processed = process_question(game_logic['questions'].pop(0))   # Process the question
+            if not processed:   # Skip invalid or blocked questions
+                if checkpoint:    # Replay must drop it too
+                    checkpoint.record_skip()
+                continue
             processed['is_bonus'] = processed.get('category') == game_logic.get('bonus_category')
-            ui.time_left = TIME_ANSWER_MAX   # Set the time left
-            if len(game_logic['questions']) > 0:
+            ui.time_left = SETTINGS.TIME_ANSWER_MAX   # Set the time left
+            if game_logic['questions'] and not game_logic.get('daily'):   # Daily questions keep their difficulty
                 difficulty = ui.show_difficulty_choice()
                 if not difficulty:  # If the user chooses to exit
                     return score
-                game_logic['questions'][0]['difficulty'] = difficulty 
+                next_question(game_logic['questions'])['difficulty'] = difficulty 
             ui.current_message = None  # Clear the previous message
+            answer_start = time.time()   # Recorded in the game history
+            paused_seconds = 0
+            hint_used = False
+            host_said = None
             while True:  # Handle hint/pause etc. commands
-                ui.stdscr.clear()
+                ui.clear_screen()
                 ui.current_score = score                               # Set the current score
                 ui.best_score = game_logic['best_score']               # Set the best score
                 ui.current_question = processed['question']            # Set the current question
@@ -424,6 +500,7 @@ def curses_main(stdscr, game_logic, process_question, calculate_score):   # Main
                     return score
                 elif choice == 'hint' and game_logic['hints_remaining'] > 0:   # Handle the hint command
                     game_logic['hints_remaining'] -= 1
+                    hint_used = True
                     removed = ui.show_hint(processed['correct'], processed['answers'])
                     ui._refresh_screen(ui.time_left)   # Refresh the screen when hint is used
                     continue   
@@ -438,6 +515,7 @@ def curses_main(stdscr, game_logic, process_question, calculate_score):   # Main
                         ui.stdscr.refresh()
                         time.sleep(1)
                     ui.pause_timer = False
+                    paused_seconds += time.time() - start_time
                     ui.current_message = None
                     continue   
                 elif choice == 'ask':   # Handle the ask command
@@ -446,21 +524,28 @@ def curses_main(stdscr, game_logic, process_question, calculate_score):   # Main
                     if random.random() < confidence:
                         decoded_answer = urllib.parse.unquote(processed['correct'])   # Decode the answer
                         message = f"Host: I'm {int(confidence*100)}% sure it's '{decoded_answer}'"
+                        host_said = 'right'
                     else:   # If the answer is not correct
                         incorrect_answers = [a for a in processed['answers'] if a != processed['correct']]   # Get all incorrect answers
                         if random.random() < 0.5:   # If the random number is less than 0.5
                             wrong = random.choice(incorrect_answers)   # Randomly select a wrong answer
                             message = f"Host: I think it's '{urllib.parse.unquote(wrong)}' but I'm not sure..."
+                            host_said = 'wrong'
                         else:
                             message = "Host: Sorry, I have no idea..."
+                            host_said = 'none'
                     ui.show_inline_message(message, 'highlight')
                     ui._refresh_screen(ui.time_left)
                     continue
                 else:
                     break  # Handle normal answer selection
             ui.current_message = None   # Clear the current message
+            answer_time = time.time() - answer_start - paused_seconds
+            points = 0
+            correct = False
             if choice and isinstance(choice, int) and 1 <= choice <= len(processed['answers']):   # If the choice is valid
                 if processed['answers'][choice-1] == processed['correct']:                        # If the answer is correct
+                    correct = True
                     points = calculate_score(processed['difficulty'])                             # Calculate the points
                     if processed.get('is_bonus'):                                                 # If the answer is a bonus answer
                         points *= 2                                                               # Double the points
@@ -470,9 +555,17 @@ def curses_main(stdscr, game_logic, process_question, calculate_score):   # Main
                     wrong_answers += 1
                     ui.show_message(f"Wrong! 😑\nThe answer is: {urllib.parse.unquote(processed['correct'])}", 
                                   'wrong')
+            game_logic['score'] = score                   # Keep the game state in sync for the checkpoint
+            game_logic['wrong_answers'] = wrong_answers
+            if checkpoint:
+                checkpoint.record_answer(game_logic)
+            if history:
+                history.record_answer(processed, correct, choice is None, answer_time, hint_used, host_said, points)
             if wrong_answers >= 3:   # When game over
+                if history:
+                    history.end_game(score)
                 # 1. Display the game over message
-                ui.stdscr.clear()
+                ui.clear_screen()
                 game_over_msg = [
                     " ██████   █████  ███    ███ ███████     ██████  ██    ██ ███████ ██████  ",
                     "██       ██   ██ ████  ████ ██          ██   ██ ██    ██ ██      ██   ██ ",
@@ -507,10 +600,12 @@ def curses_main(stdscr, game_logic, process_question, calculate_score):   # Main
                 # 5. Get the user name and update the ranking board
                 name = ui.get_user_name()
                 if name:
-                    update_rankingboard(name, score)
+                    update_rankingboard(name, score, rankingboard_file)
                 # 5. Display the ranking board
-                rankings = load_rankingboard()
+                rankings = load_rankingboard(rankingboard_file)
                 ui.show_ranking_board(rankings)
+                if game_logic.get('daily'):   # The daily challenge is played once
+                    return score
                 # 6. Ask if the user wants to play again
                 restart_msg = "Play again? (Y/N)"
                 y = ui.win_height - 3
@@ -523,6 +618,11 @@ def curses_main(stdscr, game_logic, process_question, calculate_score):   # Main
                         game_logic['questions'] = []
                         game_logic['hints_remaining'] = 1
                         game_logic['pauses_remaining'] = 1
+                        game_logic['score'] = 0
+                        game_logic['wrong_answers'] = 0
+                        if history:
+                            history.new_game()
+                        ui.refresh_settings()
                         wrong_answers = 0
                         score = 0
                         ui.current_message = None
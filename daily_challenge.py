@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import random
+import time
+from config import DAILY_DIR, DAILY_QUESTIONS, DAILY_BUILD_WAIT, OFFLINE_TOKEN
+from question_index import decode_text
+
+def today():   # Date of the challenge, in UTC so players in every time zone share the same day
+    return time.strftime('%Y-%m-%d', time.gmtime())
+
+def challenge_path(day):
+    return os.path.join(DAILY_DIR, f"{day}.json")
+
+def rankingboard_path(day):   # Separate ranking board for each daily challenge
+    return os.path.join(DAILY_DIR, f"{day}-rankingboard.json")
+
+def materialize_question(raw_question, rng):   # Decode a question and fix its answer order once for every player of the cache
+    category = decode_text(raw_question['category'])
+    correct = decode_text(raw_question['correct_answer'])
+    answers = [decode_text(ans) for ans in raw_question['incorrect_answers']] + [correct]
+    rng.shuffle(answers)
+    return {
+        'category': category,
+        'question': decode_text(raw_question['question']),
+        'answers': answers,
+        'correct': correct,
+        'difficulty': raw_question['difficulty'],
+        'remaining_hints': 1,
+        'is_bonus': True   # Every daily question comes from the bonus category
+    }
+
+def play_question(question):   # process_question for materialized questions: a fresh copy, no shuffle
+    return dict(question, answers=list(question['answers']))
+
+def load_daily_challenge(day):   # One read of the cached challenge, None if it was not built yet
+    try:
+        with open(challenge_path(day), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def build_daily_challenge(day, get_session_token, get_categories, fetch_questions):   # Build and cache the challenge, shared by every player of DAILY_DIR
+    rng = random.Random(f"quizzical-daily-{day}")   # Same seed, same bonus category; the questions are whatever the API returns now
+    categories = get_categories()
+    if not categories:
+        return None
+    bonus_category = rng.choice(sorted(categories))
+    token = get_session_token()
+    if not token or token == OFFLINE_TOKEN:   # Do not fix today's challenge from the stale local question bank
+        return None
+    questions = fetch_questions(token, amount=DAILY_QUESTIONS, category=bonus_category)
+    if not questions:
+        return None
+    challenge = {
+        'date': day,
+        'bonus_category': bonus_category,
+        'bonus_name': categories[bonus_category],
+        'questions': [materialize_question(q, rng) for q in questions]
+    }
+    os.makedirs(DAILY_DIR, exist_ok=True)
+    temp_path = challenge_path(day) + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(challenge, f)
+    os.replace(temp_path, challenge_path(day))   # Players never read a half-written challenge
+    return challenge
+
+def get_daily_challenge(day, get_session_token, get_categories, fetch_questions):   # Load the challenge, build it once if needed
+    challenge = load_daily_challenge(day)
+    if challenge:
+        return challenge
+    os.makedirs(DAILY_DIR, exist_ok=True)
+    lock_path = challenge_path(day) + '.lock'
+    try:   # Only one process builds the challenge, the others wait for its file
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            retry = time.time() - os.path.getmtime(lock_path) > DAILY_BUILD_WAIT   # Left behind by a crashed build
+            if retry:
+                os.remove(lock_path)
+        except FileNotFoundError:   # The build finished meanwhile, check the cached challenge again
+            retry = True
+        if retry:
+            return get_daily_challenge(day, get_session_token, get_categories, fetch_questions)
+        deadline = time.monotonic() + DAILY_BUILD_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(1)
+            challenge = load_daily_challenge(day)
+            if challenge:
+                return challenge
+        return None
+    try:
+        return build_daily_challenge(day, get_session_token, get_categories, fetch_questions)
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the daily challenge ahead of time (e.g. from cron)")
+    parser.add_argument('--date', default=today(), help="Day to build, YYYY-MM-DD (default: today in UTC)")
+    args = parser.parse_args()
+    from Quizzical import get_session_token, get_categories, fetch_questions
+    challenge = get_daily_challenge(args.date, get_session_token, get_categories, fetch_questions)
+    if not challenge:
+        raise SystemExit("Failed to build the daily challenge")
+    print(f"Daily challenge {args.date}: {len(challenge['questions'])} questions, bonus category {challenge['bonus_name']}")
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+import requests
+from circuit_breaker import CircuitOpen
+from config import (
+    COUNT_URL,
+    COUNTS_FILE,
+    COUNTS_TTL,
+    API_MAX_AMOUNT,
+    API_MIN_INTERVAL
+)
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+class FetchPlanner:
+    def __init__(self, counts_file=COUNTS_FILE, ttl=COUNTS_TTL, min_interval=API_MIN_INTERVAL, http_get=requests.get):
+        self.counts_file = counts_file
+        self.http_get = http_get   # Quizzical passes its circuit breaker wrapped GET
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self.counts = self.load_counts()   # str(category) -> {'time', 'total', 'easy', 'medium', 'hard'}
+        self.served = {}                   # (token, category, difficulty) -> questions already returned
+        self.limits = {}                   # (token, category, difficulty) -> upper bound learned from response code 1
+        self.exhausted = set()             # (token, category, difficulty) known to return nothing more
+        self.lock = threading.Lock()
+        self.last_request = 0
+        self.refresh_lock = threading.Lock()   # Not self.lock, which is held while waiting for a turn
+        self.refreshing = set()                # Categories whose counts are being fetched
+
+    def load_counts(self):   # Load the cached question counts from the file
+        try:
+            with open(self.counts_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_counts(self):   # Save the question counts to the file
+        try:
+            with open(self.counts_file, 'w') as f:
+                json.dump(self.counts, f)
+        except OSError:
+            pass
+
+    def get_counts(self, category):   # Cached per-difficulty question counts of a category, never waits for the API
+        if not category:
+            return None   # The API only publishes counts per category
+        return self.counts.get(str(category))   # A stale count is better than none
+
+    def refresh_counts(self, category):   # Fetch missing or old counts in the background, after the first batch
+        cached = self.get_counts(category)
+        if not category or (cached and time.time() - cached['time'] < self.ttl):
+            return
+        with self.refresh_lock:
+            if category in self.refreshing:
+                return
+            self.refreshing.add(category)
+        threading.Thread(target=self._fetch_counts, args=(category,), daemon=True).start()
+
+    def _fetch_counts(self, category):
+        try:
+            self.wait_turn()
+            response = self.http_get(COUNT_URL, params={'category': category})
+            response.raise_for_status()
+            data = response.json()['category_question_count']
+            self.counts[str(category)] = {
+                'time': time.time(),
+                'total': data['total_question_count'],
+                'easy': data['total_easy_question_count'],
+                'medium': data['total_medium_question_count'],
+                'hard': data['total_hard_question_count']
+            }
+            self.save_counts()
+        except (requests.exceptions.RequestException, CircuitOpen, KeyError, ValueError):
+            pass
+        finally:
+            with self.refresh_lock:
+                self.refreshing.discard(category)
+
+    def available(self, token, category, difficulty):   # Questions left for this token, None when unknown
+        key = (token, category, difficulty)
+        if key in self.exhausted:
+            return 0
+        counts = self.get_counts(category)
+        left = None
+        if counts:
+            left = max(counts[difficulty or 'total'] - self.served.get(key, 0), 0)
+        if key in self.limits:
+            left = self.limits[key] if left is None else min(left, self.limits[key])
+        return left
+
+    def plan(self, token, amount, category=None, difficulty=None):   # Split a request into API-sized calls
+        left = self.available(token, category, difficulty)
+        if left is not None:
+            amount = min(amount, left)
+        chunks = []
+        while amount > 0:
+            chunks.append(min(amount, API_MAX_AMOUNT))
+            amount -= chunks[-1]
+        return chunks
+
+    def record(self, token, category, difficulty, requested, code, received=0):   # Learn from an API response
+        self.refresh_counts(category)   # Counts help the next plans, the first batch never waits for them
+        key = (token, category, difficulty)
+        if code == 0:
+            self.served[key] = self.served.get(key, 0) + received
+            if received < requested:   # The API returned everything it had left
+                self.exhausted.add(key)
+        elif code == 1:   # Fewer questions than requested, the counts also include true/false ones
+            if requested <= 1:
+                self.exhausted.add(key)
+            else:
+                self.limits[key] = requested // 2
+        elif code == 4:   # The token has seen every question of this query
+            self.exhausted.add(key)
+
+    def forget(self, token):   # Drop what was learned for a token after it has been reset
+        for state in (self.served, self.limits):
+            for key in [k for k in state if k[0] == token]:
+                del state[key]
+        self.exhausted = {k for k in self.exhausted if k[0] != token}
+
+    def wait_turn(self):   # Keep consecutive API calls apart to stay under the rate limit
+        with self.lock:
+            wait = self.min_interval - (time.monotonic() - self.last_request)
+            if wait > 0:
+                time.sleep(wait)
+            self.last_request = time.monotonic()
@@ -0,0 +1,52 @@
+import json
+import time
+import uuid
+from config import GAME_HISTORY_FILE
+
+class GameHistory:   # Appends every answer and every finished game to the history file, read by analytics.py
+    def __init__(self, path=GAME_HISTORY_FILE, daily=None):
+        self.path = path
+        self.daily = daily
+        self.new_game()
+
+    def new_game(self):   # Start recording a new game
+        self.session = uuid.uuid4().hex[:12]
+        self.answered = 0
+        self.ended = False
+
+    def _append(self, record):
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError:   # History is best effort, never interrupt the game
+            pass
+
+    def record_answer(self, question, correct, timed_out, time_taken, hint_used, host_said, points):   # One answered question
+        self.answered += 1
+        self._append({
+            'type': 'answer',
+            'time': round(time.time(), 3),
+            'session': self.session,
+            'category': question.get('category') or '',
+            'difficulty': question.get('difficulty') or '',
+            'correct': bool(correct),
+            'timed_out': bool(timed_out),
+            'time_taken': round(time_taken, 3),
+            'hint': bool(hint_used),
+            'host': host_said,   # None: not asked, 'none': no idea, 'right' or 'wrong': the answer suggested
+            'bonus': bool(question.get('is_bonus')),
+            'points': points
+        })
+
+    def end_game(self, score):   # Record the final score once per game
+        if self.ended:
+            return
+        self.ended = True
+        self._append({
+            'type': 'game',
+            'time': round(time.time(), 3),
+            'session': self.session,
+            'score': score,
+            'answered': self.answered,
+            'daily': self.daily
+        })
@@ -0,0 +1,87 @@
+import hashlib
+import random
+import re
+from config import MINHASH_PERMUTATIONS, LSH_BANDS, NEAR_DUPLICATE_THRESHOLD
+from question_index import decode_text, question_id
+
+PRIME = (1 << 61) - 1   # Mersenne prime for the universal hash family
+NON_WORD = re.compile(r"[^a-z0-9]+")
+SHINGLE_SIZE = 4        # Characters per shingle, robust to small rewordings of short questions
+
+def normalize(text):   # Lower-case words separated by single spaces
+    return NON_WORD.sub(' ', decode_text(text).lower()).strip()
+
+def shingles(text):   # Character shingles of a normalized text
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def question_text(raw_question):   # Text compared for near duplicates: the question and its correct answer
+    return normalize(raw_question['question']) + ' | ' + normalize(raw_question['correct_answer'])
+
+def question_answer(raw_question):   # Near duplicates must also agree on the correct answer
+    return normalize(raw_question['correct_answer'])
+
+class NearDuplicateIndex:   # MinHash signatures bucketed by LSH bands, near duplicates are merged into clusters
+    def __init__(self, permutations=MINHASH_PERMUTATIONS, bands=LSH_BANDS, threshold=NEAR_DUPLICATE_THRESHOLD):
+        if permutations % bands:
+            raise ValueError("permutations must be a multiple of bands")
+        rng = random.Random(5003)   # Fixed seed, signatures stay comparable between runs
+        self.hashes = [(rng.randrange(1, PRIME), rng.randrange(0, PRIME)) for _ in range(permutations)]
+        self.rows = permutations // bands
+        self.threshold = threshold     # Minimum estimated Jaccard similarity of two near duplicates
+        self.buckets = [{} for _ in range(bands)]   # One table per band: band values -> keys
+        self.signatures = {}
+        self.answers = {}              # key -> normalized correct answer
+        self.parent = {}               # Union-find forest of the clusters
+
+    def signature(self, text):   # MinHash signature of a text
+        values = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big')
+                  for s in shingles(text)]
+        return [min((a * v + b) % PRIME for v in values) for a, b in self.hashes]
+
+    def similarity(self, key_a, key_b):   # Estimated Jaccard similarity of two added texts
+        sig_a, sig_b = self.signatures[key_a], self.signatures[key_b]
+        return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+    def find(self, key):   # Cluster of a key, with path halving
+        while self.parent[key] != key:
+            self.parent[key] = self.parent[self.parent[key]]
+            key = self.parent[key]
+        return key
+
+    def same_answer(self, key_a, key_b):   # Answers match if equal or one contains the other's whole words ("Da Vinci")
+        a, b = self.answers[key_a], self.answers[key_b]
+        if not a or not b:   # Punctuation-only answers normalize to nothing and match nothing
+            return False
+        return a == b or f" {a} " in f" {b} " or f" {b} " in f" {a} "
+
+    def add(self, key, text, answer=''):   # Add a text and return its cluster, only texts sharing a band are compared
+        if key in self.signatures:
+            return self.find(key)
+        self.signatures[key] = sig = self.signature(text)
+        self.answers[key] = answer
+        self.parent[key] = key
+        candidates = set()
+        for band, table in enumerate(self.buckets):
+            bucket = table.setdefault(tuple(sig[band * self.rows:(band + 1) * self.rows]), [])
+            candidates.update(bucket)
+            bucket.append(key)
+        for other in candidates:
+            if self.same_answer(key, other) and self.similarity(key, other) >= self.threshold:
+                self.parent[self.find(key)] = self.find(other)
+        return self.find(key)
+
+    def add_questions(self, raw_questions):   # Add a batch of questions as it arrives
+        for q in raw_questions:
+            self.add(question_id(q), question_text(q), question_answer(q))
+
+    def select_round(self, raw_questions):   # Keep at most one question per near-duplicate cluster
+        seen = set()
+        selected = []
+        for q in raw_questions:
+            cluster = self.add(question_id(q), question_text(q), question_answer(q))
+            if cluster not in seen:
+                seen.add(cluster)
+                selected.append(q)
+        return selected
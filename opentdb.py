@@ -0,0 +1,164 @@
+import json
+import random
+import time
+import requests
+from circuit_breaker import CircuitBreaker, CircuitOpen
+from fetch_planner import FetchPlanner
+from question_index import QuestionIndex
+from settings import SETTINGS
+from config import (
+    API_BASIC,
+    TOKEN_URL,
+    CATEGORY_URL,
+    CATEGORIES_FILE,
+    CIRCUIT_STATE_FILE,
+    OFFLINE_TOKEN
+)
+
+FETCH_PLANNER = FetchPlanner(ttl=SETTINGS.COUNTS_TTL, http_get=lambda url, **kwargs: upstream_get(url, **kwargs))   # Shared by every fetch of this process
+QUESTION_INDEX = QuestionIndex()   # Local question bank, also the stale cache served while the API is down
+
+class TokenRejected(Exception):   # The API no longer accepts the session token, a new one is needed
+    pass
+
+def upstream_get(url, **kwargs):   # GET from the API through the circuit breaker
+    def get():
+        response = requests.get(url, timeout=SETTINGS.UPSTREAM_TIMEOUT, **kwargs)
+        if response.status_code >= 500:   # Only a failing server counts against the circuit
+            response.raise_for_status()
+        return response
+    response = UPSTREAM.call(get)
+    response.raise_for_status()
+    return response
+
+def probe_upstream():   # Half-open probe: the API answers again, refresh the cached categories on the way
+    response = requests.get(CATEGORY_URL, timeout=SETTINGS.UPSTREAM_TIMEOUT)
+    response.raise_for_status()
+    save_categories({cat['id']: cat['name'] for cat in response.json()['trivia_categories']})
+    return True
+
+UPSTREAM = CircuitBreaker(probe_upstream, SETTINGS.CIRCUIT_FAILURES, SETTINGS.CIRCUIT_RESET_TIMEOUT, CIRCUIT_STATE_FILE)   # Opens when the API keeps failing, the game then plays from local caches
+
+def apply_settings():   # Copy the settings held by long-lived objects
+    UPSTREAM.failures = SETTINGS.CIRCUIT_FAILURES
+    UPSTREAM.reset_timeout = SETTINGS.CIRCUIT_RESET_TIMEOUT
+    FETCH_PLANNER.ttl = SETTINGS.COUNTS_TTL
+
+def reload_settings(report=print):   # Hot reload between rounds, returns the names of the changed settings
+    changed = SETTINGS.reload(report)
+    if changed:
+        apply_settings()
+    return changed
+
+def get_session_token_upstream():   # Get the session token from the API
+    try:
+        response = upstream_get(f"{TOKEN_URL}?command=request")   # Request the token from the API
+        data = response.json()                                    # Get the data from the API
+        if data['response_code'] == 0:                            # Check if the response code is 0
+            return data['token']                                  # Return the token
+        else:
+            print("Failed to request token! Response Code:", data['response_code'])
+            return None
+    except CircuitOpen:   # Play from the local question bank until the API is back
+        return OFFLINE_TOKEN
+    except requests.exceptions.RequestException as e:   # Handle the exception if the request fails
+        print("Error in requesting token:", str(e))     # Print the error message
+        return OFFLINE_TOKEN   # Questions can still be fetched without a token or from the local question bank
+
+def reset_session_token(token):   # Reset the session token
+    if token == OFFLINE_TOKEN:
+        return False
+    try:
+      response = upstream_get(f"{TOKEN_URL}?command=reset&token={token}")
+      return response.json()['response_code'] == 0
+    except:
+      return False
+
+def get_categories_upstream():  # Get the categories from the API, the last ones received when it fails
+    try:
+        response = upstream_get(CATEGORY_URL)
+        categories = {cat['id']: cat['name'] for cat in response.json()['trivia_categories']}
+    except:
+        return load_categories()
+    save_categories(categories)
+    return categories
+
+def save_categories(categories):   # Keep the categories for when the API is down
+    try:
+        with open(CATEGORIES_FILE, 'w') as f:
+            json.dump(categories, f)
+    except OSError:
+        pass
+
+def load_categories():   # Categories saved by the last successful request
+    try:
+        with open(CATEGORIES_FILE, 'r') as f:
+            return {int(k): v for k, v in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+def fetch_questions_upstream(token, amount=30, difficulty=None, category=None):     # Fetch the questions from the API
+    params = {
+        'encode': 'url3986',   # Encode the URL
+        'type': 'multiple'
+    }
+    if token != OFFLINE_TOKEN:   # Questions can be fetched without a token, only repeats are not prevented
+        params['token'] = token
+    if difficulty: 
+        params['difficulty'] = difficulty
+    if category:
+        params['category'] = category
+    valid_questions = []   # Initialize the valid questions list
+    rejected = None   # Response code telling that the token is no longer usable
+    for _ in range(SETTINGS.RETRY_CHANCE):  # Retry the request
+        if rejected or not UPSTREAM.allow():   # The API is down, do not wait for it
+            break
+        chunks = FETCH_PLANNER.plan(token, amount - len(valid_questions), category, difficulty)
+        if not chunks:   # Every question of this query has been served to the token
+            break
+        for chunk in chunks:   # Each chunk is at most the API maximum per call
+            try:
+                FETCH_PLANNER.wait_turn()
+                response = upstream_get(API_BASIC, params={**params, 'amount': chunk})   
+                data = response.json()  
+                code = data['response_code']
+                FETCH_PLANNER.record(token, category, difficulty, chunk, code, len(data.get('results', [])))
+                if code == 0:   # Check if the response code is 0
+                    for q in data['results']:  
+                        if len(q['incorrect_answers']) == 3:
+                            valid_questions.append(q)
+                    continue
+                if code == 4 and reset_session_token(token):   # The token is empty, start it over
+                    FETCH_PLANNER.forget(token)
+                    break
+                if code in (3, 4):   # The token is unknown, or empty and could not be reset
+                    rejected = code
+                    break
+                if code != 1:   # Response code 1 only shrinks the next plan
+                    print(f"Error: Response code {code}")
+            except CircuitOpen:
+                pass
+            except requests.exceptions.RequestException as e:   # Handle the exception if the request fails
+                print("Error in fetching questions:", str(e))
+                if UPSTREAM.closed:   # No point waiting once the circuit is open
+                    time.sleep(SETTINGS.RETRY_DELAY)
+            break
+        if len(valid_questions) >= amount:
+            break
+    if not valid_questions and rejected:
+        raise TokenRejected(rejected)
+    if not valid_questions and not UPSTREAM.closed:   # Serve stale questions while the API is down
+        return cached_questions(amount, difficulty, category)
+    return valid_questions[:amount] or None
+
+def cached_questions(amount=30, difficulty=None, category=None):   # Questions from the local question bank
+    ids = [qid for qid, q in QUESTION_INDEX.docs.items()
+           if qid not in QUESTION_INDEX.blocked_ids and (not difficulty or q['difficulty'] == difficulty)]
+    name = load_categories().get(category, '').lower() if category else None
+    in_category = [qid for qid in ids if qid in QUESTION_INDEX.by_category.get(name, ())] if name else ids
+    selected = random.sample(in_category, min(amount, len(in_category)))
+    if len(selected) < amount:   # Not enough in the category, fill the round with other ones
+        chosen = set(selected)
+        others = [qid for qid in ids if qid not in chosen]
+        selected += random.sample(others, min(amount - len(selected), len(others)))
+    return [QUESTION_INDEX.docs[qid] for qid in selected] or None
@@ -0,0 +1,169 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+PROFILE_DIR = 'profile_output'
+SAMPLE_INTERVAL = 0.005   # Seconds between two stack samples
+SUMMARY_TOP = 25          # Number of functions listed in each summary section
+RENDER_FILE = 'curses_ui.py'
+NETWORK_FUNCTIONS = ('fetch_questions', 'get_categories', 'get_session_token',                  # Quizzical.py, broker or upstream
+                     'upstream_get', 'probe_upstream', 'get_session_token_upstream', 'reset_session_token',
+                     'get_categories_upstream', 'fetch_questions_upstream',                   # opentdb.py
+                     'broker_request',                                                        # broker.py
+                     'FetchPlanner.wait_turn', 'FetchPlanner._fetch_counts')                  # fetch_planner.py
+NETWORK_MODULES = ('requests', 'urllib3', 'http', 'socket.py', 'ssl.py')
+
+def frame_label(code):   # Label a code object as "file:function" for the reports
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}"
+
+def is_render_label(label):   # Check if the function belongs to the QuizUI rendering code
+    return label.startswith(RENDER_FILE + ':QuizUI.')
+
+def is_network_label(label, filename=''):   # Check if the function talks to the upstream API
+    name = label.split(':', 1)[-1]
+    if name in NETWORK_FUNCTIONS:
+        return True
+    parts = filename.replace('\\', '/').split('/')
+    return any(module in parts for module in NETWORK_MODULES)
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):   # Initialize the sampler
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()      # Collapsed stack -> sample count
+        self.files = {}              # Label -> source file, used to classify network frames
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):   # Start sampling the target thread in the background
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):   # Stop sampling and wait for the sampler thread
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):   # Sampler thread
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:   # Walk from the innermost frame to the outermost one
+                label = frame_label(frame.f_code)
+                self.files.setdefault(label, frame.f_code.co_filename)
+                stack.append(label)
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[';'.join(stack)] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path):   # Write the stacks in the flamegraph.pl / speedscope collapsed format
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def function_counts(self):   # Count self and inclusive samples per function
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for label in set(frames):
+                total_counts[label] += count
+        return self_counts, total_counts
+
+    def summary_lines(self):   # Build the summary report
+        self_counts, total_counts = self.function_counts()
+        total = max(self.samples, 1)
+        def section(title, labels):
+            lines = [title, f"{'self%':>7} {'total%':>7}  function"]
+            for label in sorted(labels, key=lambda l: total_counts[l], reverse=True)[:SUMMARY_TOP]:
+                lines.append(f"{100 * self_counts[label] / total:7.2f} {100 * total_counts[label] / total:7.2f}  {label}")
+            return lines + ['']
+        render = [l for l in total_counts if is_render_label(l)]
+        network = [l for l in total_counts if is_network_label(l, self.files.get(l, ''))]
+        lines = [f"Sampling profile: {self.samples} samples every {self.interval * 1000:.1f} ms", '']
+        lines += section("Top functions (all)", list(total_counts))
+        lines += section("QuizUI rendering", render)
+        lines += section("Network calls", network)
+        return lines
+
+def cprofile_summary_lines(stats):   # Build the summary report from the deterministic profiler
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, callers) in stats.stats.items():
+        label = f"{os.path.basename(filename)}:{name}"
+        rows.append((label, filename, nc, tt, ct))
+    def section(title, selected):
+        lines = [title, f"{'calls':>9} {'self(s)':>9} {'total(s)':>9}  function"]
+        for label, filename, nc, tt, ct in sorted(selected, key=lambda r: r[4], reverse=True)[:SUMMARY_TOP]:
+            lines.append(f"{nc:9d} {tt:9.4f} {ct:9.4f}  {label}")
+        return lines + ['']
+    render = [r for r in rows if r[1].endswith(RENDER_FILE) and not r[0].endswith('>')]
+    network = [r for r in rows if is_network_label(r[0], r[1])]
+    lines = [f"Deterministic profile: {stats.total_calls} calls in {stats.total_tt:.3f} s", '']
+    lines += section("Top functions (all)", rows)
+    lines += section("QuizUI rendering", render)
+    lines += section("Network calls", network)
+    return lines
+
+def write_cprofile_collapsed(stats, path):   # Write caller;callee edges weighted by self time (microseconds)
+    with open(path, 'w') as f:
+        for (filename, line, name), (cc, nc, tt, ct, callers) in stats.stats.items():
+            callee = f"{os.path.basename(filename)}:{name}"
+            for (c_file, c_line, c_name), caller_stats in callers.items():
+                weight = int(caller_stats[2] * 1_000_000)   # Self time spent in callee when called from caller
+                if weight > 0:
+                    f.write(f"{os.path.basename(c_file)}:{c_name};{callee} {weight}\n")
+
+def write_memory_report(snapshot, path):   # Write the top allocation sites recorded by tracemalloc
+    stats = snapshot.statistics('lineno')
+    with open(path, 'w') as f:
+        f.write(f"Total traced memory: {sum(s.size for s in stats) / 1024:.1f} KiB\n\n")
+        for stat in stats[:SUMMARY_TOP]:
+            f.write(f"{stat}\n")
+
+def run_profiled(func, mode='sample', output_dir=PROFILE_DIR, trace_memory=False):   # Run func under a profiler
+    os.makedirs(output_dir, exist_ok=True)
+    prefix = os.path.join(output_dir, time.strftime('session-%Y%m%d-%H%M%S'))
+    written = []
+    if trace_memory:
+        tracemalloc.start()
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = SamplingProfiler()
+        profiler.start()
+    try:
+        return func()
+    finally:   # Reports are written even if the session crashes or is interrupted
+        if mode == 'cprofile':
+            profiler.disable()
+            stats = pstats.Stats(profiler)
+            profiler.dump_stats(prefix + '.prof')
+            write_cprofile_collapsed(stats, prefix + '.collapsed')
+            summary = cprofile_summary_lines(stats)
+            written += [prefix + '.prof', prefix + '.collapsed']
+        else:
+            profiler.stop()
+            profiler.write_collapsed(prefix + '.collapsed')
+            summary = profiler.summary_lines()
+            written.append(prefix + '.collapsed')
+        with open(prefix + '.summary.txt', 'w') as f:
+            f.write('\n'.join(summary) + '\n')
+        written.append(prefix + '.summary.txt')
+        if trace_memory:
+            write_memory_report(tracemalloc.take_snapshot(), prefix + '.memory.txt')
+            tracemalloc.stop()
+            written.append(prefix + '.memory.txt')
+        print("\nProfile written to: " + ', '.join(written))
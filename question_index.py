@@ -0,0 +1,137 @@
+import argparse
+import hashlib
+import html
+import json
+import re
+import urllib.parse
+from config import QUESTION_BANK_FILE, BLOCKLIST_FILE
+
+WORD = re.compile(r"[a-z0-9]+")
+
+def decode_text(text):   # Questions arrive url3986 encoded and may still contain HTML entities
+    return html.unescape(urllib.parse.unquote(text))
+
+def tokenize(text):   # Lower-case words of a decoded text
+    return set(WORD.findall(text.lower()))
+
+def question_id(raw_question):   # Stable id of a question, the same text always gets the same id
+    return hashlib.sha1(decode_text(raw_question['question']).encode('utf-8')).hexdigest()[:12]
+
+class QuestionIndex:   # Inverted index over the decoded question and answer text of the local question bank
+    def __init__(self, bank_file=QUESTION_BANK_FILE, blocklist_file=BLOCKLIST_FILE):
+        self.bank_file = bank_file
+        self.blocklist_file = blocklist_file
+        self.docs = {}             # id -> raw question as returned by the API
+        self.postings = {}         # word -> ids of the questions containing it
+        self.by_category = {}      # lower-case category name -> ids
+        self.blocked_ids = set()   # Banned questions, including those matching a banned word
+        self.blocked_terms = set()
+        self.load()
+
+    def load(self):   # Load the question bank and the blocklist
+        try:
+            with open(self.blocklist_file, 'r') as f:
+                blocklist = json.load(f)
+            self.blocked_ids = set(blocklist.get('ids', []))
+            self.blocked_terms = set(blocklist.get('terms', []))
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(self.bank_file, 'r') as f:
+                for line in f:
+                    try:
+                        self._index(json.loads(line))
+                    except (ValueError, KeyError):   # Skip a torn or malformed line
+                        continue
+        except OSError:
+            pass
+
+    def save_blocklist(self):   # Save the blocklist to the file
+        with open(self.blocklist_file, 'w') as f:
+            json.dump({'ids': sorted(self.blocked_ids), 'terms': sorted(self.blocked_terms)}, f, indent=1)
+
+    def _index(self, raw_question):   # Add one question to the in-memory index, returns its id or None if known
+        qid = question_id(raw_question)
+        if qid in self.docs:
+            return None
+        self.docs[qid] = raw_question
+        text = ' '.join([raw_question['question'], raw_question['correct_answer']] + raw_question['incorrect_answers'])
+        terms = tokenize(decode_text(text))
+        for term in terms:
+            self.postings.setdefault(term, set()).add(qid)
+        category = decode_text(raw_question.get('category', '')).lower()
+        self.by_category.setdefault(category, set()).add(qid)
+        if terms & self.blocked_terms:   # New questions with a banned word are blocked on arrival
+            self.blocked_ids.add(qid)
+        return qid
+
+    def add_many(self, raw_questions):   # Index a batch and append the new questions to the bank file
+        new = [q for q in raw_questions if self._index(q)]
+        if new:
+            with open(self.bank_file, 'a') as f:
+                for q in new:
+                    f.write(json.dumps(q) + '\n')
+        return len(new)
+
+    def is_blocked(self, raw_question):   # O(1) check used before a question is played
+        return question_id(raw_question) in self.blocked_ids
+
+    def search(self, query, category=None):   # Ids of the questions containing every word of the query
+        terms = tokenize(query)
+        if terms:
+            postings = sorted((self.postings.get(term, set()) for term in terms), key=len)
+            ids = set(postings[0]).intersection(*postings[1:])
+        else:
+            ids = set(self.docs)
+        if category:
+            ids &= self.by_category.get(category.lower(), set())
+        return sorted(ids)
+
+    def block(self, qid):   # Ban one question
+        self.blocked_ids.add(qid)
+        self.save_blocklist()
+
+    def unblock(self, qid):   # Lift the ban of one question
+        self.blocked_ids.discard(qid)
+        self.save_blocklist()
+
+    def block_term(self, term):   # Ban every question containing a word, now and in the future
+        term = term.lower()
+        self.blocked_terms.add(term)
+        self.blocked_ids |= self.postings.get(term, set())
+        self.save_blocklist()
+
+    def describe(self, qid):   # One line summary of a question for the operator
+        q = self.docs[qid]
+        mark = 'BLOCKED ' if qid in self.blocked_ids else ''
+        return (f"{qid}  {mark}[{decode_text(q['category'])} / {q['difficulty']}] "
+                f"{decode_text(q['question'])} -> {decode_text(q['correct_answer'])}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search and moderate the local question bank")
+    commands = parser.add_subparsers(dest='command', required=True)
+    search = commands.add_parser('search', help="Find questions containing every given word")
+    search.add_argument('words', nargs='*')
+    search.add_argument('--category', help="Only questions of this category (full name)")
+    commands.add_parser('blocked', help="List the banned questions and words")
+    for name, help_text in (('ban', "Ban a question by id"), ('unban', "Lift the ban of a question"),
+                            ('ban-term', "Ban every question containing a word")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('value')
+    args = parser.parse_args()
+    index = QuestionIndex()
+    if args.command == 'search':
+        results = index.search(' '.join(args.words), args.category)
+        for qid in results:
+            print(index.describe(qid))
+        print(f"{len(results)} of {len(index.docs)} questions")
+    elif args.command == 'blocked':
+        for qid in sorted(index.blocked_ids & set(index.docs)):
+            print(index.describe(qid))
+        print("Banned words:", ', '.join(sorted(index.blocked_terms)) or '-')
+    elif args.command == 'ban':
+        index.block(args.value)
+    elif args.command == 'unban':
+        index.unblock(args.value)
+    elif args.command == 'ban-term':
+        index.block_term(args.value)
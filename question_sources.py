@@ -0,0 +1,204 @@
+import abc
+import asyncio
+import itertools
+import json
+import queue
+import random
+import threading
+from settings import SETTINGS
+
+_END = object()   # Marks the end of a prefetched stream
+
+class QuestionSource(abc.ABC):   # A lazy, possibly endless, iterable of raw questions in the API format
+    @abc.abstractmethod
+    def __iter__(self):
+        pass
+
+class ListSource(QuestionSource):   # Questions already in memory
+    def __init__(self, questions):
+        self.questions = questions
+
+    def __iter__(self):
+        return iter(self.questions)
+
+class FileSource(QuestionSource):   # A JSON list or a JSON-lines file such as question_bank.jsonl, read lazily
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):   # A missing or unreadable file raises OSError, malformed content is skipped
+        with open(self.path, 'r', errors='replace') as f:
+            first = f.readline()
+            if first.lstrip().startswith('['):   # A JSON list has to be read at once
+                try:
+                    questions = json.loads(first + f.read())
+                except ValueError:
+                    return
+                if isinstance(questions, list):
+                    yield from questions
+                return
+            for line in itertools.chain([first], f):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:   # A malformed line, e.g. torn by a crash mid-write
+                    continue
+
+class ApiSource(QuestionSource):   # Batches from fetch_questions, requested only when the previous one is used up
+    def __init__(self, fetch_questions, token, category=None, difficulty=None, batch_size=None, max_batches=None):
+        self.fetch_questions = fetch_questions
+        self.token = token
+        self.category = category
+        self.difficulty = difficulty
+        self.batch_size = batch_size or SETTINGS.FETCH_BATCH_SIZE
+        self.max_batches = max_batches
+
+    def __iter__(self):
+        batches = 0
+        while self.max_batches is None or batches < self.max_batches:
+            batch = self.fetch_questions(self.token, amount=self.batch_size, difficulty=self.difficulty, category=self.category)
+            if not batch:
+                return
+            batches += 1
+            yield from batch
+
+def map_stage(func):   # Transform every question, questions mapped to None are dropped
+    def stage(questions):
+        for q in questions:
+            result = func(q)
+            if result is not None:
+                yield result
+    return stage
+
+def filter_stage(predicate):   # Keep the questions the predicate accepts
+    def stage(questions):
+        return (q for q in questions if predicate(q))
+    return stage
+
+def validate_stage():   # Keep complete multiple choice questions
+    return filter_stage(lambda q: isinstance(q, dict) and 'question' in q and 'correct_answer' in q
+                        and len(q.get('incorrect_answers', [])) == 3)
+
+def dedup_stage(key):   # Drop questions whose key was already seen
+    def stage(questions):
+        seen = set()
+        for q in questions:
+            k = key(q)
+            if k not in seen:
+                seen.add(k)
+                yield q
+    return stage
+
+def shuffle_stage(window=50, rng=random):   # Shuffle within a sliding window, keeps memory bounded on endless sources
+    def stage(questions):
+        buffer = []
+        for q in questions:
+            buffer.append(q)
+            if len(buffer) >= window:
+                yield buffer.pop(rng.randrange(len(buffer)))
+        rng.shuffle(buffer)
+        yield from buffer
+    return stage
+
+def pipeline(source, *stages):   # Chain the stages over a source, nothing runs until the result is iterated
+    questions = iter(source)
+    for stage in stages:
+        questions = stage(questions)
+    return questions
+
+class Prefetcher:   # Runs a pipeline in a background thread, at most depth questions ahead of the consumer
+    def __init__(self, questions, depth=None):
+        self.buffer = queue.Queue(maxsize=max(1, depth or SETTINGS.PREFETCH_DEPTH))   # A full buffer blocks the producer: backpressure
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self._produce, args=(questions,), daemon=True)
+        self.thread.start()
+
+    def _put(self, item):   # Wait for room in the buffer unless cancelled
+        while not self.cancelled.is_set():
+            try:
+                self.buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, questions):
+        try:
+            for q in questions:
+                if not self._put(q):
+                    return
+        except Exception as e:   # Hand the error to the consumer
+            self._put(e)
+        self._put(_END)
+
+    def get(self):   # Next question, _END when the stream is finished or cancelled
+        while True:
+            if self.cancelled.is_set():
+                return _END
+            try:
+                item = self.buffer.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        if isinstance(item, Exception):
+            raise item
+        if item is _END:
+            self._put(_END)   # Later calls also see the end
+        return item
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self.get()
+        if item is _END:
+            raise StopIteration
+        return item
+
+    def cancel(self):   # Stop the producer and drop what was prefetched
+        self.cancelled.set()
+        while True:
+            try:
+                self.buffer.get_nowait()
+            except queue.Empty:
+                break
+
+class QuestionStream:   # Iterator with one question of lookahead, what curses_main plays from
+    def __init__(self, questions):
+        self.questions = iter(questions)
+        self.head = _END
+        self.loaded = False
+
+    def peek(self):   # Next question without consuming it, None at the end
+        if not self.loaded:
+            self.head = next(self.questions, _END)
+            self.loaded = True
+        return None if self.head is _END else self.head
+
+    def pop(self, index=0):   # Consume the next question, like list.pop(0)
+        if index != 0:
+            raise IndexError("only the head of a question stream can be popped")
+        q = self.peek()
+        if q is None:
+            raise IndexError("pop from an empty question stream")
+        self.loaded = False
+        return q
+
+    def __bool__(self):
+        return self.peek() is not None
+
+    def close(self):   # Cancel a prefetching source
+        if isinstance(self.questions, Prefetcher):
+            self.questions.cancel()
+
+async def stream_async(questions, depth=None):   # Async generator over a pipeline, prefetched in a thread
+    prefetcher = Prefetcher(questions, depth)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            item = await loop.run_in_executor(None, prefetcher.get)
+            if item is _END:
+                return
+            yield item
+    finally:   # Also runs when the consuming task is cancelled
+        prefetcher.cancel()
@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import config
+from config import SETTINGS_FILE
+
+ENV_PREFIX = 'QUIZZICAL_'   # QUIZZICAL_FETCH_BATCH_SIZE=40 sets FETCH_BATCH_SIZE
+KNOBS = {   # Tunable settings: type, minimum and maximum, the defaults are the constants of config.py
+    'TIME_ANSWER_MAX': (int, 5, 300),               # Seconds to answer a question
+    'RETRY_CHANCE': (int, 1, 10),                   # Attempts per question fetch
+    'RETRY_DELAY': (float, 0, 60),                  # Seconds between two attempts
+    'FETCH_BATCH_SIZE': (int, 1, 500),              # Questions fetched per round or streamed batch
+    'PREFETCH_DEPTH': (int, 1, 1000),               # Questions a streaming source prepares ahead
+    'FRAME_RATE_MAX': (float, 1, 60),               # Frames per second of the full render profile
+    'LOW_BANDWIDTH_FRAME_RATE': (float, 0.5, 60),   # Frames per second of the low bandwidth profile
+    'POLL_INTERVAL': (float, 0.001, 0.5),           # Seconds between two keyboard polls
+    'UPSTREAM_TIMEOUT': (float, 0.5, 120),          # Seconds before an API request counts as failed
+    'CIRCUIT_FAILURES': (int, 1, 100),              # Consecutive API failures that open the circuit
+    'CIRCUIT_RESET_TIMEOUT': (float, 1, 3600),      # Seconds before probing the API again
+    'COUNTS_TTL': (int, 0, 30 * 24 * 3600),         # Seconds the question counts are cached
+    'BROKER_TIMEOUT': (float, 1, 600),              # Seconds a game waits for the broker
+    'BROKER_CACHE_TTL': (int, 0, 24 * 3600),        # Seconds before the broker refreshes a pool
+    'BROKER_POOL_SIZE': (int, 1, 50),               # Questions per broker pool refill
+    'BROKER_POOL_MAX': (int, 1, 100000)             # Questions kept per broker pool
+}
+
+class SettingsError(ValueError):   # An unknown setting or a value out of its range
+    pass
+
+def parse_value(name, value):   # Convert and check one value given as JSON or as a string
+    name = name.upper()
+    if name not in KNOBS:
+        raise SettingsError(f"Unknown setting: {name}")
+    kind, low, high = KNOBS[name]
+    if isinstance(value, bool):
+        raise SettingsError(f"{name} must be a number, got {value!r}")
+    try:
+        value = kind(value)
+    except (TypeError, ValueError):
+        raise SettingsError(f"{name} must be {'an integer' if kind is int else 'a number'}, got {value!r}")
+    if not low <= value <= high:
+        raise SettingsError(f"{name} must be between {low} and {high}, got {value}")
+    return name, value
+
+def parse_assignments(assignments):   # ['NAME=value', ...] from the command line
+    overrides = {}
+    for assignment in assignments or []:
+        name, sep, value = assignment.partition('=')
+        if not sep:
+            raise SettingsError(f"Expected NAME=value, got {assignment!r}")
+        name, value = parse_value(name.strip(), value.strip())
+        overrides[name] = value
+    return overrides
+
+class Settings:   # config.py defaults, then the settings file, the QUIZZICAL_* environment and --set, each overriding the last
+    def __init__(self, path=None, environ=os.environ):
+        self.path = path or environ.get(ENV_PREFIX + 'SETTINGS') or SETTINGS_FILE
+        self.environ = environ
+        self.overrides = {}
+        self.mtime = None
+        self.values = {name: getattr(config, name) for name in KNOBS}
+        self.sources = dict.fromkeys(KNOBS, 'default')   # name -> where the value came from
+        try:
+            self.load()
+        except SettingsError:   # Importing never fails, configure() and reload() report the error
+            pass
+
+    def __getattr__(self, name):   # SETTINGS.FETCH_BATCH_SIZE
+        values = self.__dict__.get('values', {})
+        if name in values:
+            return values[name]
+        raise AttributeError(name)
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_file(self):   # Settings file as a JSON object, empty when there is none
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            raise SettingsError(f"{self.path}: {e}")
+        if not isinstance(data, dict):
+            raise SettingsError(f"{self.path}: expected a JSON object")
+        return data
+
+    def _read_environ(self):   # Other QUIZZICAL_* variables are ignored, they may belong to wrappers or later versions
+        return {key[len(ENV_PREFIX):]: value for key, value in self.environ.items()
+                if key.startswith(ENV_PREFIX) and key[len(ENV_PREFIX):] in KNOBS}
+
+    def load(self):   # Compute every value, nothing changes if one of them is invalid
+        mtime = self._file_mtime()
+        values = {name: getattr(config, name) for name in KNOBS}
+        sources = dict.fromkeys(KNOBS, 'default')
+        for source, settings in ((self.path, self._read_file()), ('environment', self._read_environ()), ('--set', self.overrides)):
+            for name, value in settings.items():
+                try:
+                    name, value = parse_value(name, value)
+                except SettingsError as e:
+                    raise SettingsError(f"{source}: {e}")
+                values[name] = value
+                sources[name] = source
+        self.values = values
+        self.sources = sources
+        self.mtime = mtime
+
+    def configure(self, path=None, assignments=None):   # Apply the command line options
+        if path:
+            self.path = path
+        self.overrides = parse_assignments(assignments)
+        self.load()
+
+    def reload(self, report=print):   # Reload if the settings file changed, returns the names whose value changed
+        mtime = self._file_mtime()
+        if mtime == self.mtime:
+            return []
+        previous = self.values
+        try:
+            self.load()
+        except SettingsError as e:   # Keep playing with the previous values
+            self.mtime = mtime
+            report(f"Settings not reloaded: {e}")
+            return []
+        return [name for name in KNOBS if self.values[name] != previous[name]]
+
+SETTINGS = Settings()   # Shared by every module of the process
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the effective Quizzical settings and where each one comes from")
+    parser.add_argument('--settings', metavar='PATH', help=f"Settings file (default: {SETTINGS_FILE})")
+    parser.add_argument('--set', action='append', metavar='NAME=VALUE', help="Override a setting, may be repeated")
+    args = parser.parse_args()
+    try:
+        SETTINGS.configure(args.settings, args.set)
+    except SettingsError as e:
+        raise SystemExit(f"Invalid setting: {e}")
+    for name in KNOBS:
+        print(f"{name:<26} {SETTINGS.values[name]:>10}  {SETTINGS.sources[name]}")
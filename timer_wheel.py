@@ -0,0 +1,126 @@
+import threading
+import time
+from config import TIMER_TICK, TIMER_WHEEL_SLOTS, TIMER_WHEEL_LEVELS
+
+class Timer:   # Handle of a scheduled callback
+    __slots__ = ('wheel', 'expires', 'interval', 'callback', 'args', 'slot', 'cancelled')
+
+    def __init__(self, wheel, expires, interval, callback, args):
+        self.wheel = wheel
+        self.expires = expires     # Tick at which the callback runs
+        self.interval = interval   # Ticks between two runs of a repeating timer, 0 for one-shot timers
+        self.callback = callback
+        self.args = args
+        self.slot = None           # The set holding the timer while it waits
+        self.cancelled = False
+
+    def cancel(self):   # O(1): remove the timer from its slot, under the wheel lock as the wheel thread moves timers
+        with self.wheel.lock:
+            self.cancelled = True
+            if self.slot is not None:
+                self.slot.discard(self)
+                self.slot = None
+
+class TimerWheel:   # Hierarchical timer wheel, one thread serves every deadline of the process
+    def __init__(self, tick=TIMER_TICK, slots=TIMER_WHEEL_SLOTS, levels=TIMER_WHEEL_LEVELS):
+        self.tick = tick
+        self.slots = slots
+        self.wheels = [[set() for _ in range(slots)] for _ in range(levels)]
+        self.overflow = set()   # Timers beyond the range of the highest level
+        self.now = 0            # Ticks elapsed since the wheel started
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+        self.started_at = None
+
+    def _place(self, timer):   # Put a timer in the slot matching its distance from now
+        delta = timer.expires - self.now
+        for level, wheel in enumerate(self.wheels):
+            span = self.slots ** (level + 1)
+            if delta < span:
+                slot = wheel[(max(timer.expires, self.now) // self.slots ** level) % self.slots]
+                break
+        else:
+            slot = self.overflow
+        slot.add(timer)
+        timer.slot = slot
+
+    def schedule(self, delay, callback, *args, interval=None):   # Run callback after delay seconds, O(1)
+        ticks = max(1, round(delay / self.tick))
+        every = max(1, round(interval / self.tick)) if interval else 0
+        with self.lock:
+            timer = Timer(self, self.now + ticks, every, callback, args)
+            self._place(timer)
+        self.start()
+        return timer
+
+    def schedule_repeating(self, interval, callback, *args):   # Run callback every interval seconds
+        return self.schedule(interval, callback, *args, interval=interval)
+
+    def _cascade(self, level):   # Move the timers of the current slot of a level down to lower levels
+        slot = self.wheels[level][(self.now // self.slots ** level) % self.slots]
+        timers = list(slot)
+        slot.clear()
+        for timer in timers:
+            self._place(timer)
+
+    def advance(self):   # Advance the wheel by one tick and return the timers that expire
+        with self.lock:
+            self.now += 1
+            for level in range(1, len(self.wheels)):   # Cascade from the first level up while indexes wrap
+                if self.now % self.slots ** level:
+                    break
+                self._cascade(level)
+            else:
+                if self.now % self.slots ** len(self.wheels) == 0:
+                    timers = list(self.overflow)
+                    self.overflow.clear()
+                    for timer in timers:
+                        self._place(timer)
+            slot = self.wheels[0][self.now % self.slots]
+            expired = [timer for timer in slot if timer.expires <= self.now]
+            for timer in expired:
+                slot.discard(timer)
+                timer.slot = None
+                if timer.interval and not timer.cancelled:   # Repeating timers are placed again before their callback runs
+                    timer.expires = self.now + timer.interval
+                    self._place(timer)
+        return expired
+
+    def _run(self):   # Wheel thread, catches up on missed ticks if a callback was slow
+        next_tick = time.monotonic() + self.tick
+        while self.running:
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            for timer in self.advance():
+                if timer.cancelled:
+                    continue
+                try:
+                    timer.callback(*timer.args)
+                except Exception:   # A failing callback must not stop every other deadline
+                    pass
+            next_tick += self.tick
+
+    def start(self):   # Start the wheel thread on first use
+        if self.running:
+            return
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):   # Stop the wheel thread
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+
+_default_wheel = None
+
+def get_timer_wheel():   # Wheel shared by every session of the process
+    global _default_wheel
+    if _default_wheel is None:
+        _default_wheel = TimerWheel()
+    return _default_wheel
@@ -0,0 +1,143 @@
+import curses
+from collections import deque
+from contextlib import contextmanager
+
+BLANK = (' ', 0)
+ANSI_COLORS = {                   # curses color number -> ANSI foreground code
+    curses.COLOR_BLACK: 30,
+    curses.COLOR_RED: 31,
+    curses.COLOR_GREEN: 32,
+    curses.COLOR_YELLOW: 33,
+    curses.COLOR_BLUE: 34,
+    curses.COLOR_MAGENTA: 35,
+    curses.COLOR_CYAN: 36,
+    curses.COLOR_WHITE: 37
+}
+_color_pairs = {}                 # pair number -> (foreground, background), filled by the headless init_pair
+
+class VirtualScreen:   # In-memory stand-in for a curses window, counts what each frame would send
+    def __init__(self, height=40, width=120, keys=()):
+        self.height = height
+        self.width = width
+        self.cells = [[BLANK] * width for _ in range(height)]
+        self.frames = []           # Committed frames, each a tuple of rows of (char, attr) cells
+        self.stats = []            # Per committed frame: {'cells': changed cells, 'bytes': estimated output}
+        self.keys = deque(keys)    # Scripted input returned by getch
+        self.full_repaint = True   # The first frame and every clear() repaint the whole screen
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def addstr(self, y, x, text, attr=0):   # Write text like curses: wrap at the right edge, fail past the bottom
+        if not 0 <= y < self.height or not 0 <= x < self.width:
+            raise curses.error("addstr() returned ERR")
+        for char in str(text):
+            if char == '\n':
+                y, x = y + 1, 0
+            else:
+                self.cells[y][x] = (char, attr)
+                x += 1
+            if x >= self.width:
+                y, x = y + 1, 0
+            if y >= self.height:
+                raise curses.error("addstr() returned ERR")
+
+    def hline(self, y, x, ch, n):   # Draw a horizontal line of at most n cells
+        if not 0 <= y < self.height or not 0 <= x < self.width:
+            raise curses.error("hline() returned ERR")
+        char = ch if isinstance(ch, str) else chr(ch & curses.A_CHARTEXT)
+        for col in range(x, min(x + n, self.width)):
+            self.cells[y][col] = (char, 0)
+
+    def erase(self):
+        self.cells = [[BLANK] * self.width for _ in range(self.height)]
+
+    def clear(self):
+        self.erase()
+        self.full_repaint = True
+
+    def noutrefresh(self):
+        self.commit()
+
+    def refresh(self):
+        self.commit()
+
+    def getch(self):
+        return self.keys.popleft() if self.keys else -1
+
+    def nodelay(self, flag):
+        pass
+
+    def commit(self):   # Turn the current buffer into a frame and measure what changed since the last one
+        frame = tuple(tuple(row) for row in self.cells)
+        previous = self.frames[-1] if self.frames and not self.full_repaint else None
+        changed, size = frame_cost(previous, frame)
+        self.frames.append(frame)
+        self.stats.append({'cells': changed, 'bytes': size})
+        self.full_repaint = False
+
+    def snapshot(self, index=-1):   # Text of a committed frame, one string per row
+        frame = self.frames[index] if self.frames else tuple(tuple(row) for row in self.cells)
+        return [''.join(char for char, attr in row).rstrip() for row in frame]
+
+    def diff(self, a=-2, b=-1):   # Cells that differ between two committed frames
+        old, new = self.frames[a], self.frames[b]
+        return [(y, x, old[y][x], new[y][x])
+                for y in range(self.height) for x in range(self.width) if old[y][x] != new[y][x]]
+
+def sgr(attr):   # Escape sequence a terminal needs to switch to attr
+    codes = ['0']
+    if attr & curses.A_BOLD:
+        codes.append('1')
+    if attr & curses.A_UNDERLINE:
+        codes.append('4')
+    pair = (attr & curses.A_COLOR) >> 8
+    if pair in _color_pairs:
+        fg, bg = _color_pairs[pair]
+        codes += [str(ANSI_COLORS.get(fg, 39)), str(ANSI_COLORS.get(bg, 30) + 10)]
+    return f"\x1b[{';'.join(codes)}m"
+
+def frame_cost(previous, frame):   # Changed cells and estimated bytes to go from previous to frame
+    changed = 0
+    size = 0 if previous else len("\x1b[H\x1b[2J")   # A full repaint starts by clearing the screen
+    attr = None
+    cursor = None
+    for y, row in enumerate(frame):
+        for x, cell in enumerate(row):
+            if previous is None:
+                if cell == BLANK:
+                    continue
+            elif previous[y][x] == cell:
+                continue
+            changed += 1
+            if cursor != (y, x):   # Jump the cursor unless it is already there
+                size += len(f"\x1b[{y + 1};{x + 1}H")
+            if cell[1] != attr:    # Switch attributes only when they change
+                size += len(sgr(cell[1]))
+                attr = cell[1]
+            size += len(cell[0].encode('utf-8'))
+            cursor = (y, x + 1)
+    return changed, size
+
+@contextmanager
+def headless_curses():   # Let QuizUI run without a terminal by replacing the curses calls that need one
+    saved = {name: getattr(curses, name, None)
+             for name in ('start_color', 'init_pair', 'color_pair', 'doupdate', 'curs_set', 'echo', 'noecho', 'ACS_HLINE')}
+    def init_pair(pair, fg, bg):
+        _color_pairs[pair] = (fg, bg)
+    curses.start_color = lambda: None
+    curses.init_pair = init_pair
+    curses.color_pair = lambda pair: pair << 8
+    curses.doupdate = lambda: None
+    curses.curs_set = lambda visibility: None
+    curses.echo = lambda: None
+    curses.noecho = lambda: None
+    curses.ACS_HLINE = '─'
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                delattr(curses, name)
+            else:
+                setattr(curses, name, value)